@@ -8,22 +8,25 @@ import smtplib
 import ssl
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
+import api_client
+from providers import GoogleProvider, photo_url
+from scheduler import PRIORITY_DETAILS
 from config import (
     # GOOGLE_MAPS_API_KEY, <-- for nonprod only
-    GOOGLE_MAPS_API_PLACES,
     GOOGLE_MAPS_API_PLACES_DETAILS,
-    GOOGLE_MAPS_API_NEARBY,
-    GOOGLE_MAPS_API_URL_PHOTOS,
     GOOGLE_PLACE_TYPES,
 )
 
 # Fetch credentials securely (use environment variables in production)
 GOOGLE_MAPS_API_KEY = os.environ['GOOGLE_MAPS_API_KEY'] # [should match yaml def]
 
-def fetch_data(url, params=None):
-    """Fetch data from an API endpoint."""
+# Geocoding and nearby search go through the same provider the main app uses for federated search
+google = GoogleProvider(GOOGLE_MAPS_API_KEY)
+
+def fetch_data(url, params=None, priority=PRIORITY_DETAILS):
+    """Fetch data from an API endpoint, within the shared "google" request budget."""
     try:
-        response = requests.get(url, params=params)
+        response = api_client.get(url, params=params, provider="google", priority=priority)
         response.raise_for_status()
         return response.json()
     except requests.RequestException as e:
@@ -33,33 +36,25 @@ def fetch_data(url, params=None):
 @st.cache_data
 def geocode_location(location_input):
     """Geocode a location using Google Maps API."""
-    params = {"address": location_input, "key": GOOGLE_MAPS_API_KEY} # repinted, secure now
-    data = fetch_data(GOOGLE_MAPS_API_PLACES, params=params)
-    if data and data.get("results"):
-        location = data["results"][0]["geometry"]["location"]
-        return location["lat"], location["lng"]
-    return None
+    location = google.geocode(location_input)
+    return (location.latitude, location.longitude) if location else None
 
 def get_sensory_friendly_places(location, radius=1000, place_types="bakery|bar|cafe|restaurant"):
-    """Fetch sensory-friendly places using Google Places Nearby Search API."""
+    """Fetch sensory-friendly places using Google Places Nearby Search API, as Foursquare-shaped places."""
     keywords = [
         "autism", "cozy", "dim", "peaceful", "quiet", "booth", "plant", "flower", "low-lighting", "ambiance"
     ]
-    params = {
-        "location": f"{location[0]},{location[1]}",
-        "radius": radius,
-        "keyword": " OR ".join(keywords),
-        "type": place_types,
-        "key": GOOGLE_MAPS_API_KEY, # repinted, secure now
-    }
-    data = fetch_data(GOOGLE_MAPS_API_NEARBY, params=params)
-    return data.get("results", [])[:10] if data else []
+    try:
+        pages = google.iter_pages(location[0], location[1], radius, max_results=10, place_type=place_types, keywords=keywords)
+        return [place for page in pages for place in page]
+    except Exception as e:
+        st.error(f"API request failed: {e}")
+        return []
 
 def is_accessible(place_id):
     """Check if a place is accessible (ADA compliant) using Google Places Details API."""
     url = f'{GOOGLE_MAPS_API_PLACES_DETAILS}?place_id={place_id}&fields=accessibility&key={GOOGLE_MAPS_API_KEY}'
-    response = requests.get(url)
-    data = response.json()
+    data = fetch_data(url) or {}
 
     # Check if the 'result' and 'accessibility' fields are present
     if 'result' in data and 'accessibility' in data['result']:
@@ -87,15 +82,10 @@ def get_place_details(place_id):
     return data.get("result", {}) if data else {}
 
 def get_place_photos(photo_reference):
-    """Construct a photo URL from the photo reference."""
+    """Download a place photo's thumbnail on the server, so the API key never reaches the browser."""
     if not photo_reference:
         return None
-    params = {
-        "maxwidth": 400,
-        "photoreference": photo_reference,
-        "key": GOOGLE_MAPS_API_KEY, # repinted, secure now
-    }
-    return f"{GOOGLE_MAPS_API_URL_PHOTOS}?{'&'.join(f'{k}={v}' for k, v in params.items())}"
+    return google.thumbnail(photo_url(photo_reference))
 
 def display_place_info(place, details):
     """Display information about a place, including photos, reviews, and ratings."""
@@ -109,9 +99,9 @@ def display_place_info(place, details):
 
     # Display photo
     photo_ref = details.get("photos", [{}])[0].get("photo_reference")
-    photo_url = get_place_photos(photo_ref)
-    if photo_url:
-        st.image(photo_url, caption=name, use_container_width=True)
+    thumbnail = get_place_photos(photo_ref)
+    if thumbnail:
+        st.image(thumbnail, caption=name, use_container_width=True)
     else:
         st.write("No photos available.")
 
@@ -140,9 +130,9 @@ def render_map(location, places):
     m = folium.Map(location=location, zoom_start=15)
     for place in places:
         name = place.get("name", "Unknown Place")
-        address = place.get("vicinity", "Address not available")
-        lat = place["geometry"]["location"]["lat"]
-        lng = place["geometry"]["location"]["lng"]
+        address = place.get("location", {}).get("address") or "Address not available"
+        lat = place["geocodes"]["main"]["latitude"]
+        lng = place["geocodes"]["main"]["longitude"]
         popup_content = f"<b>{name}</b><br>{address}"
 
         folium.Marker(
@@ -0,0 +1,149 @@
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+import requests
+from requests.adapters import HTTPAdapter
+from cassette import CassetteMiss, get_cassette, interaction_key, response_from
+from deadline import DeadlineExceeded
+from scheduler import scheduler, PRIORITY_DETAILS
+from config import (
+    HTTP_CONNECT_TIMEOUT,
+    HTTP_READ_TIMEOUT,
+    HTTP_MAX_RETRIES,
+    HTTP_BACKOFF_BASE,
+    HTTP_BACKOFF_MAX,
+    HTTP_POOL_MAXSIZE,
+    HTTP_RETRY_STATUS_CODES,
+    SCHEDULER_MAX_WAIT,
+)
+
+# One session per process so every Streamlit session reuses the same keep-alive connections
+_session = None
+_session_lock = threading.Lock()
+
+_stats = {"calls": 0, "attempts": 0, "retries": 0, "errors": 0, "dropped": 0, "replayed": 0, "deadline_exceeded": 0}
+_stats_lock = threading.Lock()
+
+class RequestDropped(requests.RequestException):
+    """The scheduler had no request budget for this call, so it was not sent."""
+
+def _count(key, amount=1):
+    with _stats_lock:
+        _stats[key] += amount
+
+def get_session():
+    """Return the process-wide requests session, creating it on first use."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=HTTP_POOL_MAXSIZE)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+def retry_delay(attempt, response=None):
+    """Seconds to wait before the next attempt, honoring Retry-After when the server sends one."""
+    retry_after = response.headers.get("Retry-After") if response is not None else None
+    if retry_after:
+        try:
+            return min(float(retry_after), HTTP_BACKOFF_MAX)
+        except ValueError:
+            try:
+                seconds = parsedate_to_datetime(retry_after).timestamp() - time.time()
+                return min(max(seconds, 0), HTTP_BACKOFF_MAX)
+            except (TypeError, ValueError):
+                pass
+
+    # Exponential backoff with full jitter: 0..base*2^attempt, capped
+    return random.uniform(0, min(HTTP_BACKOFF_BASE * 2 ** attempt, HTTP_BACKOFF_MAX))
+
+def get(url, headers=None, params=None, timeout=None, provider=None, priority=PRIORITY_DETAILS, deadline=None):
+    """GET a URL through the shared session, retrying timeouts, connection errors, 429 and 5xx.
+
+    When a provider is given, every attempt first takes a token from that provider's bucket in
+    the shared scheduler; RequestDropped is raised when none is granted.
+    The last response is returned when the retries run out on a retryable status code;
+    connection errors and timeouts are raised as requests.RequestException.
+
+    With a cassette in replay mode the recorded response is returned instead, without a request
+    budget (CassetteMiss if there is none); in record mode the response returned is recorded.
+
+    With a deadline, timeouts, the wait for a token and backoff are all capped at the time it has
+    left, and DeadlineExceeded is raised rather than starting an attempt after it has passed.
+    """
+    if deadline is not None:
+        _check_deadline(deadline, url)
+    cassette = get_cassette()
+    if cassette is not None and cassette.replaying:
+        interaction = cassette.play(interaction_key(url, params))
+        if interaction is None:
+            raise CassetteMiss(f"No recorded response for {url}")
+        _count("replayed")
+        return response_from(interaction, url)
+
+    timeout = timeout or (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+    session = get_session()
+    _count("calls")
+
+    for attempt in range(HTTP_MAX_RETRIES + 1):
+        last_attempt = attempt == HTTP_MAX_RETRIES
+        wait = SCHEDULER_MAX_WAIT if deadline is None else deadline.cap(SCHEDULER_MAX_WAIT)
+        if provider and not scheduler.acquire(provider, priority, wait):
+            if deadline is not None:
+                _check_deadline(deadline, url)
+            _count("dropped")
+            raise RequestDropped(f"No {provider} request budget left for {url}")
+        _count("attempts")
+        try:
+            response = session.get(url, headers=headers, params=params, timeout=timeout if deadline is None else deadline.cap(timeout))
+        except (requests.ConnectionError, requests.Timeout):
+            if deadline is not None:
+                _check_deadline(deadline, url)
+            if last_attempt:
+                _count("errors")
+                raise
+            response = None
+        else:
+            if response.status_code not in HTTP_RETRY_STATUS_CODES or last_attempt:
+                if cassette is not None and cassette.recording:
+                    cassette.record(
+                        interaction_key(url, params), response.status_code, response.headers, response.content,
+                        response.elapsed.total_seconds(),
+                    )
+                return response
+
+        _count("retries")
+        delay = retry_delay(attempt, response)
+        time.sleep(delay if deadline is None else deadline.cap(delay))
+        if deadline is not None:
+            _check_deadline(deadline, url)
+
+def _check_deadline(deadline, url):
+    """Raise DeadlineExceeded, counting it, if the deadline has passed."""
+    try:
+        deadline.check(url)
+    except DeadlineExceeded:
+        _count("deadline_exceeded")
+        raise
+
+def stats():
+    """Request and connection reuse counters for the shared session."""
+    connections = 0
+    adapters = {id(adapter): adapter for adapter in get_session().adapters.values()}.values()
+    for adapter in adapters:
+        pools = adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is not None:
+                connections += pool.num_connections
+
+    with _stats_lock:
+        report = dict(_stats)
+    report["connections_opened"] = connections
+    report["connections_reused"] = max(report["attempts"] - connections, 0)
+    report["reuse_rate"] = report["connections_reused"] / report["attempts"] if report["attempts"] else 0.0
+    return report
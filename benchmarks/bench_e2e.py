@@ -0,0 +1,142 @@
+# End-to-end cost of the Find flow: the app runs headless under Streamlit's AppTest against
+# benchmarks.mock_server, a local stand-in for Foursquare and Nominatim with configurable
+# latency and error rate. Each scenario reports wall time, API calls by endpoint and peak
+# Python memory, how many places were left without photos and reviews at the Find's deadline
+# (FIND_DEADLINE_SECONDS), and the run fails when a scenario goes over its call budget, leaves
+# more than --max-unfinished places unfinished or goes over the --max-seconds / --max-peak-mb
+# limits, so CI catches regressions. Calls cut off by the deadline never count towards the
+# budget, so the unfinished check is what catches a Find that has become too slow.
+# Run from the repo root: python -m benchmarks.bench_e2e [--latency 0.05] [--error-rate 0.02]
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from benchmarks.mock_server import MockBackend
+
+APP_PATH = "foursquare_app.py"
+
+# Searches in order, each in a new session. Processes keep their caches across sessions,
+# so a repeated search measures the warm path. max_calls is the budget of successful API calls:
+# with photos and tips inline in the search results (SEARCH_INLINE_FIELDS), a search needs one
+# call per page of results, plus the geocoding call for an address.
+SCENARIOS = [
+    {"name": "city, cold", "location": "Boston, MA", "radius_miles": 1, "max_results": 50, "max_calls": 3},
+    {"name": "city, warm", "location": "Boston, MA", "radius_miles": 1, "max_results": 50, "max_calls": 0},
+    {"name": "address, cold", "location": "1 City Hall Sq, Boston, MA", "radius_miles": 2, "max_results": 25, "max_calls": 4},
+    {"name": "city, more results", "location": "Seattle, WA", "radius_miles": 3, "max_results": 100, "max_calls": 4},
+]
+
+def start_session(timeout):
+    """Open the app in a new session, returning the AppTest after its first run."""
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+    at.run()
+    return at
+
+def run_find(scenario, timeout):
+    """Run one Find in a new session, returning the finished AppTest."""
+    at = start_session(timeout)
+    next(widget for widget in at.text_input if widget.label == "Enter a location:").set_value(scenario["location"])
+    next(widget for widget in at.slider if widget.label == "Set the radius (miles):").set_value(scenario["radius_miles"])
+    next(widget for widget in at.select_slider if widget.label == "Maximum results:").set_value(scenario["max_results"])
+    at.run()
+    next(widget for widget in at.button if widget.label == "Find").click()
+    at.run()
+    return at
+
+def measure(backend, scenario, timeout):
+    """Wall time, API calls and peak memory of one scenario."""
+    calls_before, errors_before = backend.snapshot()
+    tracemalloc.reset_peak()
+    start = time.perf_counter()
+    at = run_find(scenario, timeout)
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    calls, errors = backend.snapshot()
+    calls -= calls_before
+    errors -= errors_before
+
+    return {
+        "name": scenario["name"],
+        "seconds": round(seconds, 3),
+        "calls": sum(calls.values()) - sum(errors.values()),
+        "calls_by_endpoint": dict(calls - errors),
+        "retried_errors": sum(errors.values()),
+        "peak_mb": round(peak / 2**20, 1),
+        "places": len(at.session_state["sensory_places"]) if "sensory_places" in at.session_state else 0,
+        "unfinished": sum(
+            place.get("fsq_id", "") not in at.session_state["enriched_places"] for place in at.session_state["sensory_places"]
+        ) if "sensory_places" in at.session_state else 0,
+        "app_errors": [element.value for element in at.error],
+        "max_calls": scenario["max_calls"],
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Find flow end to end against a mock API server.")
+    parser.add_argument("--port", type=int, default=0, help="mock server port; fix it to record or replay an HTTP cassette")
+    parser.add_argument("--latency", type=float, default=0.05, help="mean seconds the mock server adds to each response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of mock responses replaced by a 503")
+    parser.add_argument("--max-seconds", type=float, default=None, help="fail if any search takes longer")
+    parser.add_argument("--max-peak-mb", type=float, default=None, help="fail if any search's peak memory is higher")
+    parser.add_argument("--max-unfinished", type=int, default=0, help="fail if any search leaves more places without photos and reviews")
+    parser.add_argument("--timeout", type=float, default=120, help="seconds allowed for one script run")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    with MockBackend(port=args.port, latency=args.latency, error_rate=args.error_rate) as backend, tempfile.TemporaryDirectory() as cache_dir:
+        # Configuration is read when the app's modules are first imported, which happens in the first AppTest run
+        os.environ.update(backend.env())
+        os.environ.update({
+            "FOURSQUARE_API_KEY": "benchmark",
+            "RESPONSE_CACHE_PATH": os.path.join(cache_dir, "responses.sqlite3"),
+            "PLACE_STORE_PATH": os.path.join(cache_dir, "places.sqlite3"),
+            "PHOTO_CACHE_DIR": os.path.join(cache_dir, "photos"),
+            "TELEMETRY_TEXTFILE_PATH": os.path.join(cache_dir, "metrics.prom"),
+        })
+
+        # Importing Streamlit and the app's modules is paid once per process, not per search
+        start = time.perf_counter()
+        start_session(args.timeout)
+        startup_seconds = time.perf_counter() - start
+
+        tracemalloc.start()
+        results = [measure(backend, scenario, args.timeout) for scenario in SCENARIOS]
+        tracemalloc.stop()
+
+    print(f"App startup: {startup_seconds:.2f} s (latency {args.latency * 1000:.0f} ms, error rate {args.error_rate:.0%})")
+    print(f"{'scenario':<20} {'places':>6} {'partial':>7} {'wall':>9} {'calls':>6} {'budget':>6} {'retries':>7} {'peak':>9}  calls by endpoint")
+    for result in results:
+        endpoints = ", ".join(f"{endpoint} {count}" for endpoint, count in sorted(result["calls_by_endpoint"].items()))
+        print(
+            f"{result['name']:<20} {result['places']:>6} {result['unfinished']:>7} {result['seconds']:>7.2f} s {result['calls']:>6} "
+            f"{result['max_calls']:>6} {result['retried_errors']:>7} {result['peak_mb']:>6.1f} MB  {endpoints or '-'}"
+        )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+    failures = []
+    for result in results:
+        if result["app_errors"]:
+            failures.append(f"{result['name']}: the app showed errors: {result['app_errors']}")
+        if result["places"] == 0:
+            failures.append(f"{result['name']}: no places found")
+        if result["calls"] > result["max_calls"]:
+            failures.append(f"{result['name']}: {result['calls']} API calls, budget {result['max_calls']}")
+        if result["unfinished"] > args.max_unfinished:
+            failures.append(f"{result['name']}: {result['unfinished']} places unfinished at the deadline, limit {args.max_unfinished}")
+        if args.max_seconds is not None and result["seconds"] > args.max_seconds:
+            failures.append(f"{result['name']}: {result['seconds']:.2f} s, limit {args.max_seconds:.2f} s")
+        if args.max_peak_mb is not None and result["peak_mb"] > args.max_peak_mb:
+            failures.append(f"{result['name']}: {result['peak_mb']:.1f} MB peak, limit {args.max_peak_mb:.1f} MB")
+    for failure in failures:
+        print(f"FAIL {failure}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+# Build time and HTML payload of the results map at 10, 100 and 1000 places:
+# one folium.Marker per place (the old way) against build_results_map (GeoJSON layers,
+# clustering above MAP_CLUSTER_THRESHOLD), cold and memoized.
+# Run from the repo root: python -m benchmarks.bench_map [--sizes 10 100 1000]
+import argparse
+import random
+import time
+import folium
+from folium import Icon
+from foursquare_app import MARKER_STYLES, build_results_map
+
+CENTER = (42.3601, -71.0589)  # Boston
+
+def make_markers(count, seed=0):
+    rng = random.Random(seed)
+    return tuple(
+        (
+            CENTER[0] + rng.uniform(-0.05, 0.05),
+            CENTER[1] + rng.uniform(-0.05, 0.05),
+            f"Place {i}",
+            f"{i} Main St",
+            rng.choice(["accessible", "sensory"]),
+            round(rng.random(), 2),
+        )
+        for i in range(count)
+    )
+
+def build_marker_map(markers):
+    """The map as it was built before: one folium.Marker per place."""
+    m = folium.Map(location=list(CENTER), zoom_start=13)
+    for latitude, longitude, name, address, style, score in markers:
+        icon = Icon(icon=MARKER_STYLES[style]["icon"], icon_color="white", color=MARKER_STYLES[style]["color"], prefix="fa")
+        folium.Marker(
+            [latitude, longitude],
+            popup=f"<b>{name}</b><br>{address}<br>Sensory score: {score:.2f}",
+            icon=icon,
+            tooltip=f"<b>{name}</b><br>{address}",
+        ).add_to(m)
+    return m
+
+def measure(build):
+    """Seconds to build and render a map, and the size of its HTML in bytes."""
+    start = time.perf_counter()
+    html = build().get_root().render()
+    return time.perf_counter() - start, len(html.encode("utf-8"))
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark results map construction.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    args = parser.parse_args()
+
+    print(f"{'places':>7} {'mode':<22} {'build+render':>13} {'HTML':>10}")
+    for size in args.sizes:
+        markers = make_markers(size)
+        seconds, size_bytes = measure(lambda: build_marker_map(markers))
+        print(f"{size:>7} {'folium.Marker each':<22} {seconds * 1000:>10.1f} ms {size_bytes / 1024:>7.1f} KB")
+
+        build_results_map.clear()
+        seconds, size_bytes = measure(lambda: build_results_map(CENTER, 13, markers))
+        print(f"{size:>7} {'build_results_map':<22} {seconds * 1000:>10.1f} ms {size_bytes / 1024:>7.1f} KB")
+
+        # A rerun with the same results only pays for rendering the memoized map
+        start = time.perf_counter()
+        build_results_map(CENTER, 13, markers)
+        print(f"{size:>7} {'  memoized (build only)':<22} {(time.perf_counter() - start) * 1000:>10.1f} ms")
+
+if __name__ == "__main__":
+    main()
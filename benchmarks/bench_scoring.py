@@ -0,0 +1,51 @@
+# Throughput of the batch sensory-scoring engine on synthetic tips.
+# Run from the repo root: python -m benchmarks.bench_scoring [--places 2000] [--tips-per-place 10]
+import argparse
+import random
+import time
+from scoring import VOCABULARY, term_matrix, score_places
+
+FILLER = (
+    "great coffee friendly staff the food was good we came here on a saturday "
+    "nice place lots of seating parking was easy would come back prices fair"
+).split()
+
+def make_tips(places, tips_per_place, seed=0):
+    """Random tips of 20-40 words, about one in five words a vocabulary term."""
+    rng = random.Random(seed)
+    tips_by_place = []
+    for _ in range(places):
+        tips = []
+        for _ in range(tips_per_place):
+            words = [rng.choice(VOCABULARY) if rng.random() < 0.2 else rng.choice(FILLER) for _ in range(rng.randint(20, 40))]
+            tips.append({"user": "Bench", "text": " ".join(words)})
+        tips_by_place.append(tips)
+    return tips_by_place
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the batch sensory-scoring engine.")
+    parser.add_argument("--places", type=int, default=2000)
+    parser.add_argument("--tips-per-place", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    tips_by_place = make_tips(args.places, args.tips_per_place)
+    total_tips = args.places * args.tips_per_place
+
+    best_matrix, best_total = float("inf"), float("inf")
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        term_matrix(tips_by_place)
+        best_matrix = min(best_matrix, time.perf_counter() - start)
+
+        start = time.perf_counter()
+        scores = score_places(tips_by_place)
+        best_total = min(best_total, time.perf_counter() - start)
+
+    print(f"places: {args.places}, tips: {total_tips}, vocabulary: {len(VOCABULARY)} terms")
+    print(f"term matrix: {best_matrix * 1000:.1f} ms")
+    print(f"scoring (matrix + weighted sum): {best_total * 1000:.1f} ms, {total_tips / best_total:,.0f} tips/s")
+    print(f"mean score: {scores.mean():.3f}, max score: {scores.max():.3f}")
+
+if __name__ == "__main__":
+    main()
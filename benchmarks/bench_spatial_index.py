@@ -0,0 +1,87 @@
+# Insert and query times of the place store's R*Tree index at 10k, 100k and 1M places,
+# compared with the plain latitude-index scan it replaced.
+# Run from the repo root: python -m benchmarks.bench_spatial_index [--sizes 10000 100000 1000000]
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+from dataclasses import dataclass, field
+
+# The store reads its path from the environment when config is imported
+os.environ["PLACE_STORE_PATH"] = os.path.join(tempfile.mkdtemp(), "places.sqlite3")
+
+import geo
+import place_store
+
+CENTER = (42.3601, -71.0589)  # Boston
+SPREAD_DEG = 1.0  # places scattered over roughly 110 x 80 km
+CATEGORY_ID = "bench"
+
+@dataclass
+class BenchPlace:
+    """The attributes place_store.save_places reads from an EnrichedPlace."""
+    fsq_id: str
+    latitude: float
+    longitude: float
+    accessible: bool = False
+    sensory_score: float = 0.0
+    details: dict = field(default_factory=dict)
+
+def fill(start_id, total, rng, batch_size=10000):
+    """Insert places p{start_id} to p{total - 1}, so earlier fills are added to rather than overwritten."""
+    start = time.perf_counter()
+    for offset in range(start_id, total, batch_size):
+        batch = [
+            BenchPlace(
+                fsq_id=f"p{i}",
+                latitude=CENTER[0] + rng.uniform(-SPREAD_DEG, SPREAD_DEG) / 2,
+                longitude=CENTER[1] + rng.uniform(-SPREAD_DEG, SPREAD_DEG) / 2,
+                sensory_score=rng.random(),
+            )
+            for i in range(offset, min(offset + batch_size, total))
+        ]
+        place_store.save_places(batch, CATEGORY_ID)
+    return time.perf_counter() - start
+
+def scan_query(latitude, longitude, radius):
+    """The pre-index query: a latitude-range scan, then longitude and distance filtering in SQL and Python."""
+    south, west, north, east = geo.bbox_around(latitude, longitude, radius)
+    rows = place_store._connect().execute("""
+        SELECT p.latitude, p.longitude, p.record FROM places p
+        JOIN place_categories c ON c.fsq_id = p.fsq_id
+        WHERE c.category_id = ? AND p.latitude BETWEEN ? AND ? AND p.longitude BETWEEN ? AND ?
+        ORDER BY p.sensory_score DESC
+    """, (CATEGORY_ID, south, north, west, east))
+    return [json.loads(record) for lat, lng, record in rows if geo.haversine_m(latitude, longitude, lat, lng) <= radius]
+
+def time_queries(query, points, radius):
+    timings, found = [], 0
+    for latitude, longitude in points:
+        start = time.perf_counter()
+        found += len(query(latitude, longitude, radius))
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000, found / len(points)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the place store spatial index.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--queries", type=int, default=50)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    points = [(CENTER[0] + rng.uniform(-0.3, 0.3), CENTER[1] + rng.uniform(-0.3, 0.3)) for _ in range(args.queries)]
+    stored = 0
+    for size in sorted(args.sizes):
+        insert_seconds = fill(stored, size, rng)
+        print(f"{size:>9,} places: inserted {size - stored:,} more in {insert_seconds:.1f} s")
+        stored = size
+        for radius in (1609, 16090):
+            rtree_ms, found = time_queries(lambda lat, lng, r: place_store.query_radius(lat, lng, r, CATEGORY_ID), points, radius)
+            scan_ms, _ = time_queries(scan_query, points, radius)
+            print(f"    radius {radius:>6} m: R*Tree {rtree_ms:8.2f} ms, scan {scan_ms:8.2f} ms (median), {found:,.0f} places per query")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,321 @@
+# How one app process holds up as concurrent sessions grow. For each session count, a fresh
+# `streamlit run foursquare_app.py` process is started against benchmarks.mock_server, and that
+# many simulated users connect over Streamlit's websocket protocol at once, each walking a
+# Find/Learn/Contact script. Reports throughput, per-phase latency percentiles, and the server's
+# peak threads and memory per session. Each level starts with empty caches. Linux only (reads /proc).
+# Run from the repo root: python -m benchmarks.load_test [--sessions 1 2 4 8 16] [--iterations 2]
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import requests
+from tornado.websocket import websocket_connect
+from streamlit.proto.Alert_pb2 import Alert
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+from benchmarks.mock_server import MockBackend
+
+APP_PATH = "foursquare_app.py"
+CITIES_PATH = os.path.join("data", "us_cities.csv")
+PHASES = ["open", "find", "rerun", "learn", "contact"]
+
+def city_names():
+    """"City, ST" names from the gazetteer source, so Find geocodes offline like most real searches."""
+    with open(CITIES_PATH) as f:
+        header = f.readline().strip().split(",")
+        city, state = header.index("city"), header.index("state")
+        return [f"{row[city]}, {row[state]}" for row in (line.strip().split(",") for line in f) if row[0]]
+
+class Session:
+    """One browser tab, speaking Streamlit's websocket protocol: each run() sends the widget
+    values a user has set, waits for the script run to finish, and notes the widgets it drew."""
+
+    def __init__(self, base_url, timeout):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.widgets = {}  # label -> (element type, widget proto) from the latest run
+        self.values = {}  # widget id -> WidgetState, as the browser would keep them
+        self.errors = []  # error alerts and exceptions from the latest run
+        self._messages = {}  # hash -> ForwardMsg, for messages the server sends by reference
+        self._connection = None
+
+    async def connect(self):
+        url = self.base_url.replace("http", "ws", 1) + "/_stcore/stream"
+        self._connection = await websocket_connect(url, subprotocols=["streamlit"], max_message_size=64 * 2**20)
+
+    def close(self):
+        self._connection.close()
+
+    def set(self, label, **value):
+        """Set a widget the latest run drew, e.g. set("Your Name", string_value="Sam")."""
+        _, widget = self.widgets[label]
+        state = self.values[widget.id] = WidgetState(id=widget.id)
+        for field, field_value in value.items():
+            if field == "double_array_value":
+                state.double_array_value.data.extend(field_value)
+            else:
+                setattr(state, field, field_value)
+
+    def choose(self, label, option):
+        """Pick an option of a radio or select slider by its text."""
+        kind, widget = self.widgets[label]
+        index = list(widget.options).index(option)
+        if kind == "radio":
+            self.set(label, int_value=index)
+        else:
+            self.set(label, double_array_value=[index])
+
+    async def run(self, trigger=None):
+        """Rerun the script with the current widget values (and a button click), until it finishes."""
+        msg = BackMsg()
+        msg.rerun_script.SetInParent()  # a rerun with no widget values yet is still a rerun
+        for state in self.values.values():
+            msg.rerun_script.widget_states.widgets.add().CopyFrom(state)
+        if trigger:
+            _, widget = self.widgets[trigger]
+            msg.rerun_script.widget_states.widgets.add(id=widget.id, trigger_value=True)
+        await self._connection.write_message(msg.SerializeToString(), binary=True)
+        await asyncio.wait_for(self._until_finished(), self.timeout)
+
+    async def _until_finished(self):
+        self.widgets, self.errors = {}, []
+        while True:
+            payload = await self._connection.read_message()
+            if payload is None:
+                raise ConnectionError("the server closed the session")
+            msg = ForwardMsg()
+            msg.ParseFromString(payload)
+            if msg.WhichOneof("type") == "ref_hash":
+                msg = self._messages.get(msg.ref_hash) or self._fetch(msg.ref_hash)
+            if msg.hash:
+                self._messages[msg.hash] = msg
+
+            kind = msg.WhichOneof("type")
+            if kind == "script_finished":
+                if msg.script_finished != ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                    return
+            elif kind == "delta" and msg.delta.WhichOneof("type") == "new_element":
+                element = msg.delta.new_element
+                element_type = element.WhichOneof("type")
+                widget = getattr(element, element_type)
+                if hasattr(widget, "id") and hasattr(widget, "label") and widget.id:
+                    self.widgets[widget.label] = (element_type, widget)
+                elif element_type == "alert" and element.alert.format == Alert.ERROR:
+                    self.errors.append(element.alert.body)
+                elif element_type == "exception":
+                    self.errors.append(f"{element.exception.type}: {element.exception.message}")
+
+    def _fetch(self, ref_hash):
+        """A message the server sent by reference but this session hasn't seen, from its message cache."""
+        response = requests.get(f"{self.base_url}/_stcore/message", params={"hash": ref_hash}, timeout=self.timeout)
+        response.raise_for_status()
+        msg = ForwardMsg()
+        msg.ParseFromString(response.content)
+        return msg
+
+def session_script(rng, cities, iterations):
+    """The phases one simulated user goes through: (phase, coroutine function taking the Session)."""
+    async def open_app(session):
+        await session.connect()
+        await session.run()
+    yield "open", open_app
+
+    for _ in range(iterations):
+        async def find(session, city=rng.choice(cities), radius=rng.randint(1, 3), max_results=rng.choice([10, 25, 50])):
+            if "Enter a location:" not in session.widgets:
+                session.choose("Go to", "Find")
+                await session.run()
+            session.set("Enter a location:", string_value=city)
+            session.set("Set the radius (miles):", double_array_value=[radius])
+            session.choose("Maximum results:", str(max_results))
+            await session.run(trigger="Find")
+        yield "find", find
+
+        # Any widget change reruns the script over the results already found
+        async def rerun(session):
+            session.set("Set the radius (miles):", double_array_value=[rng.randint(1, 3)])
+            await session.run()
+        yield "rerun", rerun
+
+        async def learn(session):
+            session.choose("Go to", "Learn")
+            await session.run()
+        yield "learn", learn
+
+        async def contact(session):
+            session.choose("Go to", "Contact")
+            await session.run()
+            session.set("Your Name", string_value="Load Test")
+            session.set("Your Email", string_value="load-test@example")  # fails validation, so no mail is sent
+            session.set("Your Message", string_value="Hello")
+            await session.run(trigger="Submit")
+        yield "contact", contact
+
+async def run_session(session_id, base_url, cities, iterations, think_time, timeout, samples, failures):
+    rng = random.Random(session_id)
+    session = Session(base_url, timeout)
+    await asyncio.sleep(rng.uniform(0, think_time))  # don't start every session in the same instant
+    try:
+        for phase, action in session_script(rng, cities, iterations):
+            start = time.perf_counter()
+            try:
+                await action(session)
+            except Exception as e:  # a timed-out or broken run ends this session, not the whole level
+                failures.append(f"session {session_id}, {phase}: {type(e).__name__}: {e}")
+                return
+            samples.append((phase, time.perf_counter() - start))
+            if phase == "find" and session.errors:
+                failures.append(f"session {session_id}, find: {session.errors}")
+            await asyncio.sleep(rng.expovariate(1 / think_time) if think_time else 0)
+    finally:
+        if session._connection is not None:
+            session.close()
+
+def process_status(pid):
+    """Resident memory in MB and thread count of a process, from /proc."""
+    status = {}
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            key, _, value = line.partition(":")
+            status[key] = value.split()
+    return int(status["VmRSS"][0]) / 1024, int(status["Threads"][0])
+
+def percentile(values, quantile):
+    values = sorted(values)
+    return values[min(int(quantile * len(values)), len(values) - 1)] if values else None
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def start_server(env, timeout=60):
+    """Start the app under `streamlit run` and wait until it answers its health check."""
+    port = free_port()
+    server = subprocess.Popen(
+        [
+            sys.executable, "-m", "streamlit", "run", APP_PATH,
+            "--server.headless", "true",
+            "--server.port", str(port),
+            "--server.address", "127.0.0.1",
+            "--server.fileWatcherType", "none",
+            "--browser.gatherUsageStats", "false",
+        ],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(f"{base_url}/_stcore/health", timeout=1).ok:
+                return server, base_url
+        except requests.ConnectionError:
+            pass
+        time.sleep(0.2)
+    server.kill()
+    raise RuntimeError("the app did not start")
+
+async def run_level(sessions, server, base_url, iterations, think_time, timeout):
+    """Run the sessions at once against a started server, returning the level's report."""
+    # One session first, so imports and first-run setup aren't counted against the level
+    warmup = Session(base_url, timeout)
+    await warmup.connect()
+    await warmup.run()
+    warmup.close()
+    baseline_mb, peak_threads = process_status(server.pid)
+    peak_mb = baseline_mb
+
+    cities = city_names()
+    samples, failures = [], []
+    start = time.perf_counter()
+    tasks = [
+        asyncio.ensure_future(run_session(i, base_url, cities, iterations, think_time, timeout, samples, failures))
+        for i in range(sessions)
+    ]
+    while not all(task.done() for task in tasks):
+        rss_mb, threads = process_status(server.pid)
+        peak_mb, peak_threads = max(peak_mb, rss_mb), max(peak_threads, threads)
+        await asyncio.sleep(0.1)
+    duration = time.perf_counter() - start
+
+    latencies = {phase: [seconds for name, seconds in samples if name == phase] for phase in PHASES}
+    return {
+        "sessions": sessions,
+        "seconds": round(duration, 2),
+        "phases_per_second": round(len(samples) / duration, 2),
+        "finds_per_minute": round(len(latencies["find"]) / duration * 60, 1),
+        "latency": {
+            phase: {"p50": percentile(values, 0.5), "p95": percentile(values, 0.95), "p99": percentile(values, 0.99)}
+            for phase, values in latencies.items()
+        },
+        "peak_threads": peak_threads,
+        "baseline_rss_mb": round(baseline_mb, 1),
+        "peak_rss_mb": round(peak_mb, 1),
+        "rss_per_session_mb": round((peak_mb - baseline_mb) / sessions, 2),
+        "failures": failures,
+    }
+
+def measure_level(sessions, args):
+    """Start a fresh mock backend and app server, and load them with this many sessions."""
+    with MockBackend(latency=args.latency, error_rate=args.error_rate) as backend, tempfile.TemporaryDirectory() as cache_dir:
+        env = dict(os.environ, **backend.env())
+        env.update({
+            "FOURSQUARE_API_KEY": "load-test",
+            "RESPONSE_CACHE_PATH": os.path.join(cache_dir, "responses.sqlite3"),
+            "PLACE_STORE_PATH": os.path.join(cache_dir, "places.sqlite3"),
+            "PHOTO_CACHE_DIR": os.path.join(cache_dir, "photos"),
+            "TELEMETRY_TEXTFILE_PATH": os.path.join(cache_dir, "metrics.prom"),
+        })
+        server, base_url = start_server(env)
+        try:
+            report = asyncio.run(run_level(sessions, server, base_url, args.iterations, args.think_time, args.timeout))
+        finally:
+            server.terminate()
+            server.wait()
+        report["api_calls"] = sum(backend.snapshot()[0].values())
+    return report
+
+def format_ms(seconds):
+    return f"{seconds * 1000:.0f}" if seconds is not None else "-"
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test one app process with concurrent simulated sessions.")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--iterations", type=int, default=2, help="Find/rerun/Learn/Contact rounds per session")
+    parser.add_argument("--think-time", type=float, default=0.5, help="mean seconds a user pauses between phases")
+    parser.add_argument("--latency", type=float, default=0.05, help="mean seconds the mock server adds to each response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of mock responses replaced by a 503")
+    parser.add_argument("--timeout", type=float, default=300, help="seconds allowed for one script run")
+    parser.add_argument("--json", help="also write the reports to this file")
+    args = parser.parse_args()
+
+    reports = []
+    header = f"{'sessions':>8} {'phases/s':>8} {'finds/min':>9} " + " ".join(f"{phase + ' p50/p95 ms':>20}" for phase in PHASES)
+    print(header + f" {'threads':>7} {'RSS MB':>7} {'MB/session':>10} {'API calls':>9}", flush=True)
+    for sessions in args.sessions:
+        report = measure_level(sessions, args)
+        reports.append(report)
+        latencies = " ".join(
+            f"{format_ms(report['latency'][phase]['p50'])}/{format_ms(report['latency'][phase]['p95'])}".rjust(20) for phase in PHASES
+        )
+        print(
+            f"{sessions:>8} {report['phases_per_second']:>8.2f} {report['finds_per_minute']:>9.1f} {latencies} "
+            f"{report['peak_threads']:>7} {report['peak_rss_mb']:>7.0f} {report['rss_per_session_mb']:>10.2f} {report['api_calls']:>9}",
+            flush=True,
+        )
+        for failure in report["failures"]:
+            print(f"  FAIL {failure}", file=sys.stderr, flush=True)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(reports, f, indent=2)
+
+if __name__ == "__main__":
+    main()
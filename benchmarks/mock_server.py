@@ -0,0 +1,263 @@
+# A local stand-in for the Foursquare Places and Nominatim APIs, for benchmarks.
+# Places are built from the recorded fixtures in benchmarks/fixtures, scattered around
+# whatever point is searched, so any location returns a realistic result set.
+# Point the app at it with FOURSQUARE_API_BASE_URL=http://127.0.0.1:8765/v3/places,
+# NOMINATIM_DOMAIN=127.0.0.1:8765 and NOMINATIM_SCHEME=http (and GOOGLE_MAPS_API_BASE_URL=
+# http://127.0.0.1:8765/maps/api for Google Places, which also needs a GOOGLE_MAPS_API_KEY).
+# Run from the repo root: python -m benchmarks.mock_server [--port 8765] [--latency 0.05] [--error-rate 0.01]
+import argparse
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlparse
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+PLACE_TEMPLATES = json.load(open(os.path.join(FIXTURES_DIR, "foursquare_places.json")))
+NOMINATIM_RESULTS = json.load(open(os.path.join(FIXTURES_DIR, "nominatim.json")))  # keyed by normalized query
+
+def normalize_query(query):
+    # Same as geocoding.normalize_query. The app's modules read their configuration on import,
+    # so this module doesn't import them before the benchmark has pointed them at the server.
+    return " ".join(re.sub(r"[^\w\s]", " ", query.lower().replace("'", "")).split())
+
+class MockBackend:
+    """A threaded HTTP server answering Foursquare search, details, photos and tips, Nominatim search,
+    and Google Places nearby search and geocoding.
+
+    latency is the mean delay added to every response, in seconds (jittered by +/-50%).
+    error_rate is the fraction of responses replaced by a 503, which the app's client retries.
+    places_per_search is how many places any search area holds, served in pages of the requested limit.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, error_rate=0.0, places_per_search=200, seed=0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.places_per_search = places_per_search
+        self.counts = Counter()  # endpoint -> requests answered, injected errors included
+        self.errors = Counter()  # endpoint -> injected errors
+        self._places = {}  # fsq_id -> place, for the per-place endpoints
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def env(self):
+        """Environment variables that point the app at this server."""
+        return {
+            "FOURSQUARE_API_BASE_URL": f"{self.url}/v3/places",
+            "NOMINATIM_DOMAIN": self.url.split("://", 1)[1],
+            "NOMINATIM_SCHEME": "http",
+            "GOOGLE_MAPS_API_BASE_URL": f"{self.url}/maps/api",
+        }
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def snapshot(self):
+        """Copies of the request and injected-error counts."""
+        with self._lock:
+            return Counter(self.counts), Counter(self.errors)
+
+    def _search_area(self, latitude, longitude, radius):
+        """Every place in a search area, the same each time the area is searched."""
+        area_rng = random.Random(f"{latitude:.6f},{longitude:.6f},{radius}")
+        places = []
+        for i in range(self.places_per_search):
+            template = PLACE_TEMPLATES[i % len(PLACE_TEMPLATES)]
+            # Uniform over the disc, inside 90% of the radius
+            distance = radius * 0.9 * math.sqrt(area_rng.random())
+            bearing = area_rng.uniform(0, 2 * math.pi)
+            place_latitude = latitude + distance * math.cos(bearing) / 111_320
+            place_longitude = longitude + distance * math.sin(bearing) / (111_320 * math.cos(math.radians(latitude)))
+            fsq_id = f"{area_rng.getrandbits(64):016x}"
+            place = {
+                "fsq_id": fsq_id,
+                "name": f"{template['name']} #{i // len(PLACE_TEMPLATES) + 1}",
+                "categories": template["categories"],
+                "geocodes": {"main": {"latitude": round(place_latitude, 6), "longitude": round(place_longitude, 6)}},
+                "location": dict(template["location"], address=f"{i + 1} Mock St"),
+                "distance": round(distance),
+            }
+            places.append(place)
+            with self._lock:
+                self._places[fsq_id] = (place, template)
+        return places
+
+    def _respond(self, endpoint, path, query):
+        """(status, body, extra headers) for one request."""
+        if endpoint == "nominatim":
+            result = NOMINATIM_RESULTS.get(normalize_query(query.get("q", [""])[0]))
+            return 200, [result] if result else [], {}
+
+        if endpoint == "google_geocode":
+            result = NOMINATIM_RESULTS.get(normalize_query(query.get("address", [""])[0]))
+            if not result:
+                return 200, {"status": "ZERO_RESULTS", "results": []}, {}
+            location = {"lat": float(result["lat"]), "lng": float(result["lon"])}
+            return 200, {"status": "OK", "results": [{"geometry": {"location": location}, "formatted_address": result["display_name"]}]}, {}
+
+        if endpoint == "google_nearby":
+            # Half of the Foursquare places already served near the point (as Google would know them,
+            # a few meters off), so federated results have duplicates to merge, and five of its own
+            latitude, longitude = (float(value) for value in query["location"][0].split(","))
+            radius = int(query.get("radius", ["1000"])[0])
+            with self._lock:
+                known = [place for place, _ in self._places.values()]
+            nearby = [
+                place for place in known
+                if math.hypot((place["geocodes"]["main"]["latitude"] - latitude) * 111_320,
+                              (place["geocodes"]["main"]["longitude"] - longitude) * 111_320 * math.cos(math.radians(latitude))) <= radius
+            ][:30:2]
+            results = [
+                {
+                    "place_id": f"g{place['fsq_id']}",
+                    "name": place["name"],
+                    "geometry": {"location": {"lat": place["geocodes"]["main"]["latitude"] + 0.00003, "lng": place["geocodes"]["main"]["longitude"]}},
+                    "vicinity": place["location"]["address"],
+                    "types": ["point_of_interest"],
+                }
+                for place in nearby
+            ]
+            results += [
+                {
+                    "place_id": f"gonly{i}",
+                    "name": f"Google Only Place #{i + 1}",
+                    "geometry": {"location": {"lat": latitude + 0.001 * (i + 1), "lng": longitude}},
+                    "vicinity": f"{i + 1} Google Way",
+                    "types": ["cafe"],
+                    "rating": 4.2,
+                    "user_ratings_total": 12,
+                }
+                for i in range(5)
+            ]
+            return 200, {"status": "OK", "results": results[:20]}, {}
+
+        if endpoint == "search":
+            latitude, longitude = (float(value) for value in query["ll"][0].split(","))
+            radius = int(query.get("radius", ["1000"])[0])
+            limit = int(query.get("limit", ["10"])[0])
+            offset = int(query.get("cursor", ["0"])[0])
+            places = self._search_area(latitude, longitude, radius)
+            # Like Foursquare, fields= adds the requested per-place data to each result
+            fields = query["fields"][0].split(",") if "fields" in query else []
+            inline = [field for field in ("photos", "tips", "rating", "stats", "features") if field in fields]
+            if inline:
+                with self._lock:
+                    templates = [self._places[place["fsq_id"]][1] for place in places]
+                places = [dict(place, **{field: template[field] for field in inline}) for place, template in zip(places, templates)]
+            headers = {}
+            if offset + limit < len(places):
+                next_query = {key: values[0] for key, values in query.items()}
+                next_query["cursor"] = offset + limit
+                headers["Link"] = f'<{self.url}{path}?{urlencode(next_query)}>; rel="next"'
+            return 200, {"results": places[offset:offset + limit]}, headers
+
+        fsq_id = path.split("/")[3]
+        with self._lock:
+            place, template = self._places.get(fsq_id, (None, None))
+        if place is None:
+            return 404, {"message": "Place not found"}, {}
+        if endpoint == "photos":
+            return 200, template["photos"], {}
+        if endpoint == "tips":
+            return 200, template["tips"][:int(query.get("limit", ["5"])[0])], {}
+        return 200, place, {}
+
+    def _handler(self):
+        backend = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, like the real APIs
+
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                query = parse_qs(parsed.query)
+                if parsed.path == "/search":
+                    endpoint = "nominatim"
+                elif parsed.path == "/maps/api/geocode/json":
+                    endpoint = "google_geocode"
+                elif parsed.path == "/maps/api/place/nearbysearch/json":
+                    endpoint = "google_nearby"
+                elif parsed.path == "/v3/places/search":
+                    endpoint = "search"
+                elif re.fullmatch(r"/v3/places/[^/]+/(photos|tips)", parsed.path):
+                    endpoint = parsed.path.rsplit("/", 1)[1]
+                elif re.fullmatch(r"/v3/places/[^/]+", parsed.path):
+                    endpoint = "details"
+                else:
+                    self._send(404, {"message": "Unknown endpoint"})
+                    return
+
+                with backend._lock:
+                    backend.counts[endpoint] += 1
+                    delay = backend.latency * backend._rng.uniform(0.5, 1.5)
+                    fail = backend._rng.random() < backend.error_rate
+                    if fail:
+                        backend.errors[endpoint] += 1
+                time.sleep(delay)
+                if fail:
+                    self._send(503, {"message": "Injected error"}, {"Retry-After": "0"})
+                    return
+                self._send(*backend._respond(endpoint, parsed.path, query))
+
+            def _send(self, status, body, headers=None):
+                payload = json.dumps(body).encode("utf-8")
+                try:
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(payload)))
+                    for name, value in (headers or {}).items():
+                        self.send_header(name, value)
+                    self.end_headers()
+                    self.wfile.write(payload)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # the app stopped waiting, e.g. at a Find's deadline
+
+            def log_message(self, format, *args):
+                pass  # one line per request would drown out the benchmark output
+
+        return Handler
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a local stand-in for the Foursquare and Nominatim APIs.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.05, help="mean seconds added to every response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of responses replaced by a 503")
+    parser.add_argument("--places-per-search", type=int, default=200)
+    args = parser.parse_args()
+
+    backend = MockBackend(args.host, args.port, args.latency, args.error_rate, args.places_per_search)
+    for name, value in backend.env().items():
+        print(f"export {name}={value}")
+    try:
+        backend.start()._thread.join()
+    except KeyboardInterrupt:
+        backend.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+import base64
+import gzip
+import json
+import os
+import sys
+import threading
+import time
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+import requests
+from requests.structures import CaseInsensitiveDict
+from response_cache import cache_key
+from config import (
+    HTTP_CASSETTE_MODE,
+    HTTP_CASSETTE_PATH,
+    HTTP_CASSETTE_LATENCY,
+)
+
+# Only the headers the app reads are kept
+RECORDED_HEADERS = ("Content-Type", "Link", "Retry-After")
+# Query parameters left out of interaction keys, so API keys never end up in a cassette
+SECRET_PARAMS = ("key",)
+
+class CassetteMiss(requests.RequestException):
+    """Replay mode found no recorded response for a request."""
+
+class Cassette:
+    """Recorded HTTP interactions in a gzipped JSON-lines file.
+
+    In record mode every interaction is appended to the file as its own gzip member, so a
+    recording interrupted at any point is still readable (compact() rewrites it as one stream).
+    In replay mode the file is loaded once and the latest recording of each request is served,
+    after the configured latency: a number of seconds, or "recorded" for the time the request
+    originally took.
+    """
+
+    def __init__(self, path, mode, latency="0"):
+        self.path = path
+        self.mode = mode
+        self.latency = latency
+        self._interactions = {}
+        self._lock = threading.Lock()
+        if mode == "replay":
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                for line in f:
+                    interaction = json.loads(line)
+                    self._interactions[interaction["key"]] = interaction
+        elif mode == "record":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    @property
+    def recording(self):
+        return self.mode == "record"
+
+    @property
+    def replaying(self):
+        return self.mode == "replay"
+
+    def __len__(self):
+        return len(self._interactions)
+
+    def play(self, key):
+        """The recorded interaction for a request key, or None if there isn't one."""
+        interaction = self._interactions.get(key)
+        if interaction is not None:
+            delay = interaction["elapsed"] if self.latency == "recorded" else float(self.latency)
+            if delay > 0:
+                time.sleep(delay)
+        return interaction
+
+    def record(self, key, status, headers, body, elapsed):
+        """Append one interaction; body is bytes."""
+        interaction = {
+            "key": key,
+            "status": status,
+            "headers": {name: headers[name] for name in RECORDED_HEADERS if name in headers},
+            "elapsed": round(elapsed, 4),
+        }
+        try:
+            interaction["body"] = body.decode("utf-8")
+        except UnicodeDecodeError:
+            interaction["body_b64"] = base64.b64encode(body).decode("ascii")  # e.g. photos
+        line = json.dumps(interaction, separators=(",", ":")) + "\n"
+        with self._lock:
+            self._interactions[key] = interaction
+            with gzip.open(self.path, "at", encoding="utf-8") as f:
+                f.write(line)
+
+def body_of(interaction):
+    """The recorded response body as bytes."""
+    if "body_b64" in interaction:
+        return base64.b64decode(interaction["body_b64"])
+    return interaction["body"].encode("utf-8")
+
+def response_from(interaction, url):
+    """Rebuild a requests.Response from a recorded interaction."""
+    response = requests.Response()
+    response.status_code = interaction["status"]
+    response.headers = CaseInsensitiveDict(interaction["headers"])
+    response._content = body_of(interaction)
+    response.encoding = "utf-8"
+    response.url = url
+    return response
+
+# One cassette per process, opened on first use (None when record/replay is off)
+_cassette = None
+_cassette_lock = threading.Lock()
+
+def get_cassette():
+    """Return the configured cassette, or None when HTTP_CASSETTE_MODE is "off"."""
+    global _cassette
+    if HTTP_CASSETTE_MODE not in ("record", "replay"):
+        return None
+    if _cassette is None:
+        with _cassette_lock:
+            if _cassette is None:
+                _cassette = Cassette(HTTP_CASSETTE_PATH, HTTP_CASSETTE_MODE, HTTP_CASSETTE_LATENCY)
+    return _cassette
+
+def interaction_key(url, params=None):
+    """The key a request is recorded under: its normalized URL, as in the response cache, without secrets."""
+    parts = urlsplit(cache_key(url, params))
+    query = [(name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True) if name not in SECRET_PARAMS]
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+def compact(path):
+    """Rewrite a recorded cassette as a single gzip stream, keeping the latest recording of each request."""
+    interactions = Cassette(path, "replay")._interactions
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with gzip.open(tmp_path, "wt", encoding="utf-8", compresslevel=9) as f:
+        for interaction in interactions.values():
+            f.write(json.dumps(interaction, separators=(",", ":")) + "\n")
+    os.replace(tmp_path, path)
+    return len(interactions)
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (2, 3) or sys.argv[1] != "compact":
+        sys.exit("usage: python cassette.py compact [<cassette.jsonl.gz>]")
+    path = sys.argv[2] if len(sys.argv) == 3 else HTTP_CASSETTE_PATH
+    size = os.path.getsize(path)
+    count = compact(path)
+    print(f"compacted {count} interactions in {path}: {size / 1024:.1f} KB -> {os.path.getsize(path) / 1024:.1f} KB")
@@ -1,10 +1,129 @@
-# Foursquare API Base URL
-FOURSQUARE_API_BASE_URL = "https://api.foursquare.com/v3/places"
+import os
+
+# Foursquare API Base URL (overridable to point the app at a local stand-in, e.g. for benchmarks)
+FOURSQUARE_API_BASE_URL = os.getenv("FOURSQUARE_API_BASE_URL", "https://api.foursquare.com/v3/places")
 
 # Function to construct Foursquare API URLs
 def get_foursquare_url(endpoint, params=""):
    return f"{FOURSQUARE_API_BASE_URL}/{endpoint}{params}"
 
+# Maximum number of places enriched (photos, tips, accessibility) at the same time
+ENRICHMENT_MAX_WORKERS = 8
+
+# Shared HTTP client: connect/read timeouts in seconds, retries with jittered exponential backoff
+HTTP_CONNECT_TIMEOUT = 3.05
+HTTP_READ_TIMEOUT = 10
+HTTP_MAX_RETRIES = 3
+HTTP_BACKOFF_BASE = 0.5  # seconds, doubled on every retry
+HTTP_BACKOFF_MAX = 8  # seconds, also caps how long a Retry-After header can make us wait
+HTTP_POOL_MAXSIZE = 16  # keep-alive connections per host
+HTTP_RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# Persistent response cache shared by every Streamlit process on the host
+RESPONSE_CACHE_PATH = os.getenv("RESPONSE_CACHE_PATH", ".cache/responses.sqlite3")
+RESPONSE_CACHE_MAX_BYTES = 256 * 1024 * 1024
+# Seconds each kind of Foursquare response stays fresh
+RESPONSE_CACHE_TTLS = {
+      "search": 6 * 60 * 60,
+      "details": 24 * 60 * 60,
+      "tips": 24 * 60 * 60,
+      "photos": 7 * 24 * 60 * 60,
+      "geocode": 30 * 24 * 60 * 60,
+   }
+
+# Searches are snapped to geohash cells no larger than this fraction of the search radius,
+# so nearby searches (e.g. "Boston" and "Boston, MA") resolve to the same cached request
+GEOHASH_CELL_FRACTION = 1.0
+# Largest radius the Foursquare search endpoint accepts, in meters
+FOURSQUARE_MAX_RADIUS = 100000
+
+# Foursquare returns at most 50 places per search page
+SEARCH_MAX_PAGE_SIZE = 50
+# Choices for how many places a single Find may load
+SEARCH_RESULT_BUDGETS = [10, 25, 50, 100, 200]
+# Ask the search endpoint for photos, tips, rating and features inline, so enrichment only calls
+# the per-place /photos and /tips endpoints for places whose search record lacks them
+SEARCH_INLINE_FIELDS = os.getenv("SEARCH_INLINE_FIELDS", "true").lower() == "true"
+SEARCH_FIELDS = ["fsq_id", "name", "geocodes", "location", "categories", "distance", "photos", "tips", "rating", "stats", "features"]
+
+# Seconds a whole Find may take, from geocoding through the search to photos and reviews; calls still
+# outstanding then are cancelled and the results found so far are shown, marked as incomplete
+FIND_DEADLINE_SECONDS = float(os.getenv("FIND_DEADLINE_SECONDS", "2"))
+
+# Place providers a Find searches in parallel (comma-separated: foursquare, google); Google also needs GOOGLE_MAPS_API_KEY
+SEARCH_PROVIDERS = [name.strip() for name in os.getenv("SEARCH_PROVIDERS", "foursquare").split(",") if name.strip()]
+# Seconds a Find waits for the providers; results from any still searching after that are left out
+FEDERATED_SEARCH_TIMEOUT = 5
+# Places from different providers with the same name and closer than this (meters) are one place
+DEDUPE_DISTANCE_M = 75
+
+# Keywords that suggest a place is sensory-friendly; sent as the search query and matched in reviews
+SENSORY_KEYWORDS = [
+      "ambiance", "autism", "booth", "calm", "cozy", "dim", "low lighting",
+      "low noise", "not crowded", "peaceful", "quiet", "sensory-friendly",
+      "soft music", "spacious"
+   ]
+
+# Keywords in a place's name, address or reviews that suggest it is accessible
+ACCESSIBLE_KEYWORDS = [
+      "wheelchair", "accessible", "ramp", "elevator", "mobility"
+   ]
+
+# Weight of each keyword mention when scoring places on their tips (see scoring.py)
+SCORING_WEIGHTS = {
+      "sensory": 1.0,
+      "accessible": 0.5,
+   }
+
+# Local place store filled by the offline ingestion command (ingest.py)
+PLACE_STORE_PATH = os.getenv("PLACE_STORE_PATH", ".cache/places.sqlite3")
+PLACE_STORE_PRECISION = 5  # geohash cells of roughly 5 x 5 km are swept and tracked for coverage
+PLACE_STORE_MAX_AGE = 30 * 24 * 60 * 60  # seconds before an ingested cell is no longer trusted for Find
+INGEST_RATE_LIMIT = 5  # Foursquare requests per second during ingestion
+INGEST_MAX_RESULTS_PER_CELL = 100
+
+# Nominatim geocoding (https://operations.osmfoundation.org/policies/nominatim/)
+NOMINATIM_USER_AGENT = "sensory_heaven (https://sensoryheaven.streamlit.app)"
+NOMINATIM_TIMEOUT = 5  # seconds
+NOMINATIM_DOMAIN = os.getenv("NOMINATIM_DOMAIN", "nominatim.openstreetmap.org")
+NOMINATIM_SCHEME = os.getenv("NOMINATIM_SCHEME", "https")
+
+# Offline gazetteer of common city names, built by gazetteer.py from data/us_cities.csv
+GAZETTEER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "gazetteer.bin")
+
+# Results maps with more markers than this are drawn as client-side clusters
+MAP_CLUSTER_THRESHOLD = 50
+# Built maps kept in memory, keyed by center, zoom level and markers
+MAP_CACHE_ENTRIES = 64
+
+# Photo proxy: thumbnails are downloaded once and served from a size-capped disk cache
+PHOTO_PROXY_ENABLED = os.getenv("PHOTO_PROXY_ENABLED", "true").lower() == "true"
+PHOTO_CACHE_DIR = os.getenv("PHOTO_CACHE_DIR", ".cache/photos")
+PHOTO_CACHE_MAX_BYTES = 128 * 1024 * 1024
+PHOTO_THUMBNAIL_SIZE = (300, 300)
+PHOTO_THUMBNAIL_QUALITY = 75  # JPEG quality
+# Seconds a photo download may take, retries included, before the card shows "Photo unavailable"
+PHOTO_FETCH_DEADLINE_SECONDS = 3
+
+# Outbound request budgets per provider, shared by every session in the process:
+# (requests per second, burst size)
+SCHEDULER_BUCKETS = {
+      "foursquare": (10, 20),
+      "nominatim": (1, 1),  # Nominatim's usage policy: at most 1 request per second
+      "google": (10, 20),
+   }
+SCHEDULER_MAX_WAIT = 10  # seconds a request may queue for a token before it is given up
+
+# Record/replay of outbound HTTP (cassette.py): "off", "record" (write every response to the cassette)
+# or "replay" (answer from the cassette without touching the network)
+HTTP_CASSETTE_MODE = os.getenv("HTTP_CASSETTE_MODE", "off").lower()
+HTTP_CASSETTE_PATH = os.getenv("HTTP_CASSETTE_PATH", ".cache/cassettes/default.jsonl.gz")
+# Delay before each replayed response: seconds, or "recorded" for the time the request took when recorded
+HTTP_CASSETTE_LATENCY = os.getenv("HTTP_CASSETTE_LATENCY", "0")
+
+# Metrics in the Prometheus text format, rewritten after every Find (e.g. for node_exporter's textfile collector)
+TELEMETRY_TEXTFILE_PATH = os.getenv("TELEMETRY_TEXTFILE_PATH", ".cache/metrics.prom")
+
 # Foursquare category IDs: https://docs.foursquare.com/data-products/docs/categories
 FOURSQUARE_CATEGORIES = {
       "Restaurant": "4d4b7105d754a06374d81259",  # Dining and Drinking > Restaurant
@@ -23,12 +142,29 @@ FOURSQUARE_CATEGORIES = {
    }
 
 #-------------------------------------------------- Google --------------------------------------------------#
-GOOGLE_MAPS_API_BASE_URL = "https://maps.googleapis.com/maps/api"
+GOOGLE_MAPS_API_BASE_URL = os.getenv("GOOGLE_MAPS_API_BASE_URL", "https://maps.googleapis.com/maps/api")
 GOOGLE_MAPS_API_PLACES = f"{GOOGLE_MAPS_API_BASE_URL}/geocode/json"
 GOOGLE_MAPS_API_PLACES_DETAILS = f"{GOOGLE_MAPS_API_BASE_URL}/place/details/json" 
 GOOGLE_MAPS_API_NEARBY = f"{GOOGLE_MAPS_API_BASE_URL}/place/nearbysearch/json"
 GOOGLE_MAPS_API_URL_PHOTOS = f"{GOOGLE_MAPS_API_BASE_URL}/place/photo"  
 
+# Google place type searched for each category in FOURSQUARE_CATEGORIES
+GOOGLE_CATEGORY_TYPES = {
+      "Restaurant": "restaurant",
+      "Cafe": "cafe",
+      "Retail": "store",
+      "Sports & Rec": "gym",
+      "Park": "park",
+      "Library": "library",
+      "Movie Theater": "movie_theater",
+      "Museum": "museum",
+      "Hospital": "hospital",
+      "Places of Worship": "church",
+      "Zoo": "zoo",
+      "Aquarium": "aquarium",
+      "Airport": "airport"
+   }
+
 # Google categories: https://developers.google.com/maps/documentation/places/web-service/supported_types#table1
 GOOGLE_PLACE_TYPES = [
       "accounting",
@@ -0,0 +1,52 @@
+import time
+from contextlib import contextmanager
+import requests
+
+class DeadlineExceeded(requests.Timeout):
+    """A request was not sent, or was given up, because its Find's deadline had passed."""
+
+class Deadline:
+    """A time budget shared by every call made on behalf of one Find.
+
+    Functions that make outbound calls take it as an optional deadline argument, cap their
+    timeouts and waits at the time it has left, and raise DeadlineExceeded instead of starting
+    a call once it has run out. stage() records how long each part of the Find took.
+    """
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.started = time.monotonic()
+        self.expires_at = self.started + seconds
+        self.stages = {}  # stage name -> seconds spent in it
+
+    def remaining(self):
+        """Seconds left, never negative."""
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    @property
+    def expired(self):
+        return time.monotonic() >= self.expires_at
+
+    def check(self, what="request"):
+        """Raise DeadlineExceeded if the deadline has passed."""
+        if self.expired:
+            raise DeadlineExceeded(f"Deadline of {self.seconds:g} s passed before {what}")
+
+    def cap(self, timeout):
+        """A timeout (seconds, or a (connect, read) tuple) cut down to the time left.
+
+        Never zero, since requests rejects a zero timeout; check() first to stop at the deadline.
+        """
+        remaining = max(self.remaining(), 0.001)
+        if isinstance(timeout, tuple):
+            return tuple(min(part, remaining) for part in timeout)
+        return min(timeout, remaining)
+
+    @contextmanager
+    def stage(self, name):
+        """Time a stage of the Find, adding to any earlier time spent in the same stage."""
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.monotonic() - started
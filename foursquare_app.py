@@ -1,20 +1,56 @@
 import os
+import time
+import html
+import math
 import requests
 import smtplib
 from urllib.parse import quote_plus
 import ssl
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FutureTimeoutError
+import threading
+from dataclasses import dataclass, field
 import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 import folium
 from folium import Icon
+from folium.plugins import FastMarkerCluster
 from streamlit_folium import st_folium
-from geopy.geocoders import Nominatim
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 import config
+import api_client
+import response_cache
+import geo
+import place_store
+import geocoding
+import gazetteer
+import photo_cache
+from scheduler import PRIORITY_SEARCH, PRIORITY_DETAILS, PRIORITY_PHOTOS
+from singleflight import foursquare_flights, geocoding_flights, photo_flights, WaitTimedOut
+from scheduler import scheduler
+import telemetry
+from cassette import CassetteMiss
+from deadline import Deadline, DeadlineExceeded
+from providers import PlaceProvider, GoogleProvider, FederatedSearch
+from keywords import sensory_matcher, accessible_matcher
+from scoring import score_places
 from config import (
     get_foursquare_url,
     FOURSQUARE_API_BASE_URL,
     FOURSQUARE_CATEGORIES,
+    SENSORY_KEYWORDS,
+    ENRICHMENT_MAX_WORKERS,
+    GEOHASH_CELL_FRACTION,
+    FOURSQUARE_MAX_RADIUS,
+    SEARCH_MAX_PAGE_SIZE,
+    SEARCH_RESULT_BUDGETS,
+    SEARCH_INLINE_FIELDS,
+    SEARCH_FIELDS,
+    SEARCH_PROVIDERS,
+    FIND_DEADLINE_SECONDS,
+    MAP_CLUSTER_THRESHOLD,
+    MAP_CACHE_ENTRIES,
+    PHOTO_PROXY_ENABLED,
 )
 
 FOURSQUARE_API_KEY = os.getenv('FOURSQUARE_API_KEY')
@@ -29,40 +65,99 @@ FOURSQUARE_API_URL_REVIEWS = get_foursquare_url("{fsq_id}/tips", params="?limit=
 
 HEADERS = {"Authorization": FOURSQUARE_API_KEY}
 
+# Scheduler priority of each kind of Foursquare request: searches first, photos last
+ENDPOINT_PRIORITIES = {
+    "search": PRIORITY_SEARCH,
+    "details": PRIORITY_DETAILS,
+    "tips": PRIORITY_DETAILS,
+    "photos": PRIORITY_PHOTOS,
+}
+
 #-------------------------------------------------- Utility Functions --------------------------------------------------#
-@st.cache_data
-def geocode_location(location_input):
-    """Geocode a location using Nominatim."""
-    geolocator = Nominatim(user_agent="streamlit_app")
-    return geolocator.geocode(location_input)
+def geocode_location(location_input, deadline=None):
+    """Geocode a location: known city names come from the offline gazetteer, anything else from Nominatim."""
+    location = gazetteer.lookup(location_input)
+    telemetry.record_cache("gazetteer", location is not None)
+    return location or geocoding.geocode(location_input, deadline)
 
-def fetch_data(url, params=None):
+def fetch_data(url, params=None, deadline=None):
     """Fetch data from Foursquare API."""
-    response = requests.get(url, headers=HEADERS, params=params)
+    data, _ = fetch_page(url, params, deadline)
+    return data
+
+def fetch_page(url, params=None, deadline=None):
+    """Fetch data from Foursquare API along with the URL of the next page, if there is one.
+
+    Responses are answered from the persistent response cache when possible. DeadlineExceeded
+    is raised when the deadline passes before the response arrives; callers decide what to leave out.
+    """
+    cache_key = response_cache.cache_key(url, params)
+    cached = response_cache.get(cache_key)
+    telemetry.record_cache(f"foursquare_{response_cache.endpoint_for(url)}", cached is not None)
+    if cached is not None:
+        return cached["data"], cached["next"]
+
+    # Sessions asking for the same URL at the same time share one request and its parsed result.
+    # Each waits only as long as its own deadline allows, and retries if the leader's ran out first.
+    try:
+        return foursquare_flights.do(
+            cache_key, lambda: _fetch_page_from_api(url, params, cache_key, deadline),
+            timeout=None if deadline is None else deadline.remaining(), retry_on=(DeadlineExceeded,),
+        )
+    except WaitTimedOut:
+        raise DeadlineExceeded(f"Deadline of {deadline.seconds:g} s passed waiting for {url}") from None
+
+def _fetch_page_from_api(url, params, cache_key, deadline=None):
+    # A request for the same URL may have finished between our cache miss and becoming the leader
+    cached = response_cache.peek(cache_key)
+    if cached is not None:
+        return cached["data"], cached["next"]
+
+    endpoint = response_cache.endpoint_for(url)
+    started = time.perf_counter()
+    try:
+        response = api_client.get(
+            url, headers=HEADERS, params=params, provider="foursquare", priority=ENDPOINT_PRIORITIES[endpoint], deadline=deadline,
+        )
+    except DeadlineExceeded:
+        # Out of time for this Find; the page shows what it has, marked as incomplete
+        telemetry.record_request("foursquare", endpoint, "deadline", time.perf_counter() - started)
+        raise
+    except api_client.RequestDropped:
+        # Low-priority work skipped while the request budget is exhausted; the card just goes without
+        telemetry.record_request("foursquare", endpoint, "dropped", time.perf_counter() - started)
+        return {}, None
+    except CassetteMiss:
+        # Replaying a recording that never made this request; counted on the Ops page rather than shown
+        telemetry.record_request("foursquare", endpoint, "replay_miss", time.perf_counter() - started)
+        return {}, None
+    except requests.RequestException as e:
+        telemetry.record_request("foursquare", endpoint, "error", time.perf_counter() - started)
+        st.error(f"API request failed: {e}")
+        return {}, None
+    telemetry.record_request("foursquare", endpoint, response.status_code, time.perf_counter() - started, len(response.content))
     if response.status_code != 200:
         st.error(f"API request failed ({response.status_code}): {response.text}")
-        return {}
+        return {}, None
     try:
-        return response.json()
+        data = response.json()
     except ValueError as e:
         st.error(f"Failed to parse JSON response: {e}")
-        return {}
+        return {}, None
+
+    # Foursquare sends the pagination cursor as a Link header: <https://...&cursor=...>; rel="next"
+    next_url = response.links.get("next", {}).get("url")
+    response_cache.put(cache_key, endpoint, {"data": data, "next": next_url})
+    return data, next_url
 
 #-------------------------------------------------- Foursquare API Calls --------------------------------------------------#
-def get_sensory_friendly_places(latitude, longitude, radius=None, category_id=None):
-    """Fetch sensory-friendly places from Foursquare API, including sensory keywords."""
-    
-    # Sensory Keywords to filter places
-    sensory_keywords = [
-        "ambiance", "autism", "booth", "calm", "cozy", "dim", "low lighting", 
-        "low noise", "not crowded", "peaceful", "quiet", "sensory-friendly", 
-        "soft music", "spacious"
-    ]
-
-    # This step combines all the words in the 'sensory_keywords' list into one long string.
+def sensory_search_url(latitude, longitude, radius=None, category_id=None, limit=10):
+    """Build the Foursquare search URL for sensory-friendly places around a point."""
+
+    # This step combines all the words in the 'SENSORY_KEYWORDS' list (see config.py) into one long string.
     # The 'join' function adds a space between each keyword in the list.
     # Example: "quiet calm low lighting soft ... sensory friendly"
-    query_string = " ".join(sensory_keywords)
+    query_string = " ".join(SENSORY_KEYWORDS)
 
     # This step ensures that the entire query string can be sent over the web properly.
     # URL encode the query string to make it safe to include in the API request URL
@@ -72,37 +167,96 @@ def get_sensory_friendly_places(latitude, longitude, radius=None, category_id=No
     encoded_query = quote_plus(query_string)  
 
     # Use Foursquare API URL to make the request
-    url = get_foursquare_url("search", params=f"?ll={latitude}%2C{longitude}&radius={radius}&limit=10&categories={category_id}&query={encoded_query}")
-    data = fetch_data(url)
-    
-    # Return the list of results
-    return data.get("results", []) if data else []
+    params = f"?ll={latitude}%2C{longitude}&radius={radius}&limit={limit}&categories={category_id}&query={encoded_query}"
+
+    # Photos and tips requested here come back with each result, saving a /photos and a /tips call per place
+    if SEARCH_INLINE_FIELDS:
+        params += f"&fields={quote_plus(','.join(SEARCH_FIELDS))}"
+    return get_foursquare_url("search", params=params)
+
+def cell_search_url(cell, radius, category_id=None, limit=10):
+    """Build the search URL for a geohash cell, widened so it covers a radius around any point in the cell."""
+    latitude, longitude = geo.geohash_center(cell)
+    height, width = geo.cell_size_m(len(cell), latitude)
+    cell_radius = min(round(radius + math.hypot(height, width) / 2), FOURSQUARE_MAX_RADIUS)
+    return sensory_search_url(round(latitude, 6), round(longitude, 6), cell_radius, category_id, limit)
+
+def iter_sensory_friendly_places(latitude, longitude, radius=None, category_id=None, max_results=10, deadline=None):
+    """Yield pages of sensory-friendly places, following Foursquare's pagination cursor.
+
+    Pages are only requested as the caller consumes them, and no more than max_results
+    places are yielded in total.
+    """
+    limit = min(max_results, SEARCH_MAX_PAGE_SIZE)
+
+    if radius is None:
+        url = sensory_search_url(latitude, longitude, radius, category_id, limit)
+        results, next_url = fetch_page(url, deadline=deadline)
+        extra_results = []
+    else:
+        # Snap the search to the geohash cell containing the point, so every search in that cell
+        # (for the same radius and category) shares one cached Foursquare request
+        precision = geo.precision_for_radius(radius, latitude, fraction=GEOHASH_CELL_FRACTION)
+        cell = geo.geohash_encode(latitude, longitude, precision)
+        results, next_url = fetch_page(cell_search_url(cell, radius, category_id, limit), deadline=deadline)
+
+        # Neighbouring cells overlap this search circle, so any of them already in the cache are merged in at no cost
+        extra_results = []
+        for neighbor in geo.geohash_neighbors(cell):
+            cached = response_cache.peek(response_cache.cache_key(cell_search_url(neighbor, radius, category_id, limit)))
+            if cached:
+                extra_results += cached["data"].get("results", [])
+
+    seen = set()
+    remaining = max_results
+    page = (results.get("results", []) if results else []) + extra_results
+    while True:
+        # Drop duplicates and anything outside the radius around the point that was actually searched
+        places = []
+        for place in page:
+            fsq_id = place.get("fsq_id")
+            if fsq_id in seen:
+                continue
+            seen.add(fsq_id)
+            main = place.get("geocodes", {}).get("main", {})
+            if radius is not None and "latitude" in main and "longitude" in main:
+                if geo.haversine_m(latitude, longitude, main["latitude"], main["longitude"]) > radius:
+                    continue
+            places.append(place)
+
+        if places:
+            yield places[:remaining]
+            remaining -= len(places[:remaining])
+        if remaining <= 0 or not next_url:
+            return
+
+        data, next_url = fetch_page(next_url, deadline=deadline)
+        page = data.get("results", []) if data else []
+
+def get_sensory_friendly_places(latitude, longitude, radius=None, category_id=None, max_results=10, deadline=None):
+    """Fetch sensory-friendly places from Foursquare API, including sensory keywords."""
+    return [place for page in iter_sensory_friendly_places(latitude, longitude, radius, category_id, max_results, deadline) for place in page]
 
-def is_accessible(place):
+def is_accessible(place, reviews):
     """Determine if the place is accessible based on keywords or attributes."""
-    name = place.get("name", "").lower()
-    address = place.get("location", {}).get("address", "").lower()
-    reviews = get_place_reviews(place.get("fsq_id", ""))
-    
     # Check if the place has the wheelchair accessible attribute in amenities
+    # (under features when the search returns them inline)
     amenities = place.get("amenities", {})
     if amenities.get("wheelchair_accessible", False):
         return True
-    
-    # Define accessibility keywords that suggest the establishment is accessible in the reviews
-    accessible_keywords = [
-        "wheelchair", "accessible", "ramp", "elevator", "mobility"
-    ]
-
-    # Search for accessibility keywords in name, address, or reviews
-    for keyword in accessible_keywords:
-        if keyword.lower() in name or keyword.lower() in address:
-            return True
-        for review in reviews:
-            if keyword.lower() in review.get("text", "").lower():
-                return True
-    
-    return False
+    if place.get("features", {}).get("amenities", {}).get("wheelchair_accessible", False):
+        return True
+
+    # Search for accessibility keywords (ACCESSIBLE_KEYWORDS in config.py) in name, address, or reviews.
+    # The matcher scans each text once for all keywords.
+    name = place.get("name", "")
+    address = place.get("location", {}).get("address", "")
+    return accessible_matcher.matches(name, address, *(review.get("text", "") for review in reviews))
+
+def sensory_keywords_in(place, reviews):
+    """Return the sensory keywords found in the place's name or reviews, in config order."""
+    found = sensory_matcher.keywords_in(place.get("name", ""), *(review.get("text", "") for review in reviews))
+    return [keyword for keyword in SENSORY_KEYWORDS if keyword in found]
 
 def get_place_details(place_id):
     """Fetch detailed information about a place."""
@@ -114,34 +268,457 @@ def get_place_details(place_id):
     
     return data, rating, review_count
 
-def get_place_photos(place_id):
-    data = fetch_data(FOURSQUARE_API_URL_PHOTOS.format(fsq_id=place_id))
-    return [photo["prefix"] + "300x300" + photo["suffix"] for photo in data] if data else []
-
-def get_place_reviews(place_id):
-    data = fetch_data(FOURSQUARE_API_URL_REVIEWS.format(fsq_id=place_id))
-    return [{"user": tip.get("user", {}).get("firstName", "Anonymous"), "text": tip.get("text", "")} for tip in data] if data else []
+def get_place_photos(place_id, deadline=None):
+    data = fetch_data(FOURSQUARE_API_URL_PHOTOS.format(fsq_id=place_id), deadline=deadline)
+    return photo_urls_from(data) if data else []
+
+def get_place_reviews(place_id, deadline=None):
+    data = fetch_data(FOURSQUARE_API_URL_REVIEWS.format(fsq_id=place_id), deadline=deadline)
+    return reviews_from(data) if data else []
+
+def photo_urls_from(photos):
+    return [photo["prefix"] + "300x300" + photo["suffix"] for photo in photos]
+
+def reviews_from(tips):
+    return [{"user": tip.get("user", {}).get("firstName", "Anonymous"), "text": tip.get("text", "")} for tip in tips]
+
+def inline_photo_urls(photos):
+    """Photo URLs from a search record's inline photos, picked like the /photos call: the newest indoor photo."""
+    indoor = [photo for photo in photos if "indoor" in photo.get("classifications", [])]
+    newest = sorted(indoor or photos, key=lambda photo: photo.get("created_at", ""), reverse=True)
+    return photo_urls_from(newest[:1])
+
+def inline_calls_saved(place):
+    """Per-place calls a search record makes unnecessary: one each for inline photos and tips."""
+    return ("photos" in place) + ("tips" in place)
+
+#-------------------------------------------------- Providers --------------------------------------------------#
+class FoursquareProvider(PlaceProvider):
+    """Foursquare Places search, geocoded through the gazetteer and Nominatim."""
+
+    name = "foursquare"
+
+    def geocode(self, query, deadline=None):
+        return geocode_location(query, deadline)
+
+    def iter_pages(self, latitude, longitude, radius, category_id=None, max_results=10, deadline=None):
+        for page in iter_sensory_friendly_places(latitude, longitude, radius, category_id, max_results, deadline):
+            yield [dict(place, provider=self.name) for place in page]
+
+    # Photos and tips that came inline with the search are used as they are; the per-place
+    # endpoints are only called for whichever of the two the search record lacks
+    def photo_urls(self, place, deadline=None):
+        return inline_photo_urls(place["photos"]) if "photos" in place else get_place_photos(place.get("fsq_id", ""), deadline)
+
+    def reviews(self, place, deadline=None):
+        return reviews_from(place["tips"][:5]) if "tips" in place else get_place_reviews(place.get("fsq_id", ""), deadline)
+
+PROVIDERS = {provider.name: provider for provider in (FoursquareProvider(), GoogleProvider())}
+
+def search_providers():
+    """The providers a Find searches (SEARCH_PROVIDERS in config.py), leaving out any not configured, e.g. Google without a key."""
+    return [PROVIDERS[name] for name in SEARCH_PROVIDERS if name in PROVIDERS and PROVIDERS[name].available()]
+
+def script_context_initializer():
+    """A thread initializer that attaches this script run's context, so st calls from worker threads still render."""
+    ctx = get_script_run_ctx()
+    def attach_ctx():
+        add_script_run_ctx(threading.current_thread(), ctx)
+    return attach_ctx
+
+#-------------------------------------------------- Enrichment --------------------------------------------------#
+@dataclass
+class EnrichedPlace:
+    """Everything fetched for one place during a search, built once per fsq_id."""
+    fsq_id: str
+    details: dict  # the place record returned by the search call
+    photo_urls: list = field(default_factory=list)
+    reviews: list = field(default_factory=list)
+    accessible: bool = False
+    sensory_keywords: list = field(default_factory=list)
+    sensory_score: float = 0.0
+
+    @property
+    def name(self):
+        return self.details.get("name", "Unknown Place")
+
+    @property
+    def address(self):
+        return self.details.get("location", {}).get("address", "Address not available")
+
+    @property
+    def latitude(self):
+        return self.details.get("geocodes", {}).get("main", {}).get("latitude")
+
+    @property
+    def longitude(self):
+        return self.details.get("geocodes", {}).get("main", {}).get("longitude")
+
+def enrich_place(place, deadline=None):
+    """Gather the photos and reviews for a single place, from its provider, and derive its accessibility flag."""
+    fsq_id = place.get("fsq_id", "")
+    provider = PROVIDERS[place.get("provider", FoursquareProvider.name)]
+    photo_urls = provider.photo_urls(place, deadline)
+    reviews = provider.reviews(place, deadline)
+    return EnrichedPlace(
+        fsq_id=fsq_id,
+        details=place,
+        photo_urls=photo_urls,
+        reviews=reviews,
+        accessible=is_accessible(place, reviews),
+        sensory_keywords=sensory_keywords_in(place, reviews),
+    )
+
+def iter_enriched_places(places, max_workers=ENRICHMENT_MAX_WORKERS, deadline=None):
+    """Enrich places concurrently, yielding (index, EnrichedPlace) as each one completes.
+
+    With a deadline, places not enriched in time are left out: once it passes, places not
+    started yet are cancelled, and those in flight give up at their next API call.
+    """
+    if not places:
+        return
+
+    # A place that shows up more than once in a search is only fetched once
+    indexes_by_id = {}
+    for index, place in enumerate(places):
+        indexes_by_id.setdefault(place.get("fsq_id", ""), []).append(index)
+
+    executor = ThreadPoolExecutor(max_workers=min(max_workers, len(indexes_by_id)), initializer=script_context_initializer())
+    futures = [executor.submit(enrich_place, places[indexes[0]], deadline) for indexes in indexes_by_id.values()]
+    try:
+        for future in as_completed(futures, timeout=None if deadline is None else deadline.remaining()):
+            try:
+                record = future.result()
+            except DeadlineExceeded:
+                continue
+            for index in indexes_by_id[record.fsq_id]:
+                yield index, record
+    except FutureTimeoutError:
+        pass
+    finally:
+        # Don't wait for calls still in flight at the deadline; they give up at their next request
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def score_enriched_places(records):
+    """Score a batch of enriched places on their reviews in one vectorized pass."""
+    for record, score in zip(records, score_places([record.reviews for record in records])):
+        record.sensory_score = float(score)
+
+def enrich_places(places, max_workers=ENRICHMENT_MAX_WORKERS):
+    """Enrich places concurrently, returning one EnrichedPlace per place in search order."""
+    enriched = [None] * len(places)
+    for index, record in iter_enriched_places(places, max_workers):
+        enriched[index] = record
+    score_enriched_places(list({record.fsq_id: record for record in enriched}.values()))
+    return enriched
 
 #-------------------------------------------------- UI & Display Functions --------------------------------------------------#
-def display_place_info(name, address, photo_urls, reviews):
-    """Fetch and display place information including rating and review count in Streamlit."""
-    st.subheader(name)
-    st.write(f"**Address**: {address or 'N/A'}")
+def display_place_info(place):
+    """Display an enriched place's information in Streamlit."""
+    st.subheader(place.name)
+    st.write(f"**Address**: {place.address or 'N/A'}")
+    if place.details.get("rating") is not None:
+        st.write(f"**Rating**: {place.details['rating']}/10 ({place.details.get('stats', {}).get('total_ratings', 0)} ratings)")
     
-    if photo_urls:
-        st.image(photo_urls[0], caption=name, width=300)
-    else:
+    provider = PROVIDERS[place.details.get("provider", FoursquareProvider.name)]
+    if not place.photo_urls:
         st.write("No photos available.")
+    elif PHOTO_PROXY_ENABLED or provider.server_side_photos:
+        # Only download the photo once the user asks for it; after that it comes from the local cache.
+        # Photos that need an API key always come this way, so the key never reaches the browser.
+        if st.toggle("Show photo", key=f"photo-{place.fsq_id}"):
+            thumbnail = provider.thumbnail(place.photo_urls[0])
+            if thumbnail:
+                st.image(thumbnail, caption=place.name, width=300)
+            else:
+                st.write("Photo unavailable.")
+    else:
+        st.image(place.photo_urls[0], caption=place.name, width=300)
+
+    if place.sensory_keywords:
+        st.write(f"**Sensory-friendly mentions**: {', '.join(place.sensory_keywords)}")
     
     st.write("**Most Recent Reviews:**")
-    if reviews:
+    if place.reviews:
         # Assuming 'reviews' contains a 'rating' and 'review_count'
-        for review in reviews:
+        for review in place.reviews:
             st.write(f"- {review['user']}: {review['text']}")
             
     else:
         st.write("No reviews available.")
 
+def operational_gauges():
+    """Point-in-time readings from the HTTP client, caches, single-flight groups and scheduler."""
+    client = api_client.stats()
+    cache = response_cache.stats()
+    flights = {"foursquare": foursquare_flights, "geocoding": geocoding_flights, "photos": photo_flights}
+    budgets = scheduler.report()
+    return {
+        "http_connections_opened": client["connections_opened"],
+        "http_connection_reuse_ratio": client["reuse_rate"],
+        "http_retries": client["retries"],
+        "response_cache_entries": cache["entries"],
+        "response_cache_bytes": cache["bytes"],
+        "response_cache_hit_ratio": cache["hit_rate"],
+        "singleflight_calls_saved": {(("group", name),): group.report()["shared"] for name, group in flights.items()},
+        "scheduler_tokens": {(("provider", name),): report["tokens"] for name, report in budgets.items()},
+        "scheduler_dropped": {(("provider", name),): report["dropped"] for name, report in budgets.items()},
+    }
+
+def export_metrics():
+    """Write the current metrics to the Prometheus textfile and return them."""
+    text = telemetry.render_prometheus(operational_gauges())
+    try:
+        telemetry.write_textfile(text)
+    except OSError:
+        pass  # the Ops page still shows the metrics when the file can't be written
+    return text
+
+def ops_page():
+    """API usage, latency, caching and connection reuse for this process."""
+    metrics = telemetry.snapshot()
+
+    st.subheader("API requests")
+    rows = []
+    for (provider, endpoint), counts in sorted(metrics["latency_counts"].items()):
+        statuses = {
+            status: count for (p, e, status), count in metrics["requests"].items() if (p, e) == (provider, endpoint)
+        }
+        total = sum(counts)
+        rows.append({
+            "provider": provider,
+            "endpoint": endpoint,
+            "requests": total,
+            "statuses": ", ".join(f"{status}: {count}" for status, count in sorted(statuses.items())),
+            "mean (ms)": round(metrics["latency_sums"][(provider, endpoint)] / total * 1000) if total else None,
+            "p50 (s) ≤": telemetry.latency_quantile(counts, 0.5),
+            "p95 (s) ≤": telemetry.latency_quantile(counts, 0.95),
+            "KB": round(metrics["bytes"].get((provider, endpoint), 0) / 1024, 1),
+        })
+    if rows:
+        st.dataframe(rows, hide_index=True)
+    else:
+        st.write("No API requests yet.")
+
+    st.subheader("Find stages")
+    rows = []
+    for stage in ("geocode", "search", "enrich"):
+        counts = metrics["stage_counts"].get(stage)
+        if not counts:
+            continue
+        total = sum(counts)
+        rows.append({
+            "stage": stage,
+            "runs": total,
+            "mean (ms)": round(metrics["stage_sums"][stage] / total * 1000),
+            "p50 (s) ≤": telemetry.latency_quantile(counts, 0.5),
+            "p95 (s) ≤": telemetry.latency_quantile(counts, 0.95),
+        })
+    if rows:
+        finds = metrics["counters"].get("finds_total", 0)
+        partial = metrics["counters"].get("finds_partial_total", 0)
+        st.write(f"{partial:g} of {finds:g} Finds hit the {FIND_DEADLINE_SECONDS:g} s deadline and showed partial results.")
+        st.dataframe(rows, hide_index=True)
+    else:
+        st.write("No Finds yet.")
+
+    st.subheader("Caches")
+    rows = []
+    for cache in sorted({cache for cache, _ in metrics["cache_lookups"]}):
+        hits = metrics["cache_lookups"].get((cache, "hit"), 0)
+        misses = metrics["cache_lookups"].get((cache, "miss"), 0)
+        rows.append({"cache": cache, "hits": hits, "misses": misses, "hit ratio": f"{hits / (hits + misses):.0%}"})
+    if rows:
+        st.dataframe(rows, hide_index=True)
+    else:
+        st.write("No cache lookups yet.")
+
+    st.subheader("Connections, coalescing and budgets")
+    client = api_client.stats()
+    st.write(
+        f"{client['attempts']} requests over {client['connections_opened']} connections "
+        f"({client['reuse_rate']:.0%} reused), {client['retries']} retries, {client['dropped']} dropped by the scheduler, {client['replayed']} replayed from the HTTP cassette, "
+        f"{client['deadline_exceeded']} given up at a Find's deadline."
+    )
+    st.dataframe([{"group": name, **group.report()} for name, group in
+                  {"foursquare": foursquare_flights, "geocoding": geocoding_flights, "photos": photo_flights}.items()], hide_index=True)
+    st.dataframe([{"provider": name, **report} for name, report in scheduler.report().items()], hide_index=True)
+
+    st.subheader("Prometheus metrics")
+    text = export_metrics()
+    st.download_button("Download metrics", text, file_name="metrics.prom", mime="text/plain")
+    st.code(text, language="text")
+
+# Marker icon and color for each kind of result on the map
+MARKER_STYLES = {
+    "pending": {"icon": "ellipsis-h", "color": "gray"},  # not enriched yet
+    "accessible": {"icon": "wheelchair", "color": "blue"},
+    "sensory": {"icon": "smile", "color": "green"},
+}
+
+# FastMarkerCluster builds each marker in the browser from a row of plain data
+CLUSTER_MARKER_CALLBACK = """
+function (row) {
+    var icon = L.AwesomeMarkers.icon({icon: row[2], markerColor: row[3], iconColor: "white", prefix: "fa"});
+    var marker = L.marker(new L.LatLng(row[0], row[1]), {icon: icon});
+    marker.bindTooltip(row[4]);
+    marker.bindPopup(row[5]);
+    return marker;
+};
+"""
+
+def map_markers(places, enriched):
+    """Hashable (latitude, longitude, name, address, style, score) tuples for the places that have coordinates."""
+    markers = []
+    for place in places:
+        latitude = place.get("geocodes", {}).get("main", {}).get("latitude")
+        longitude = place.get("geocodes", {}).get("main", {}).get("longitude")
+        if not (latitude and longitude):
+            continue
+        record = enriched.get(place.get("fsq_id", ""))
+        if record is None:
+            style, score = "pending", None
+        else:
+            # Set icon based on accessibility
+            style, score = ("accessible" if record.accessible else "sensory"), round(record.sensory_score, 2)
+        markers.append((
+            latitude,
+            longitude,
+            place.get("name", "Unknown Place"),
+            place.get("location", {}).get("address", "Address not available"),
+            style,
+            score,
+        ))
+    return tuple(markers)
+
+@st.cache_resource(max_entries=MAP_CACHE_ENTRIES)
+def build_results_map(coordinates, zoom_level, markers):
+    """Build the results map, memoized on the center, zoom level and markers.
+
+    Markers go in as one GeoJSON layer per marker style, or as a FastMarkerCluster
+    when there are more than MAP_CLUSTER_THRESHOLD of them.
+    """
+    m = folium.Map(location=list(coordinates), zoom_start=zoom_level)
+
+    if len(markers) > MAP_CLUSTER_THRESHOLD:
+        rows = []
+        for latitude, longitude, name, address, style, score in markers:
+            tooltip_content = f"<b>{html.escape(name)}</b><br>{html.escape(address)}"
+            popup_content = tooltip_content if score is None else f"{tooltip_content}<br>Sensory score: {score:.2f}"
+            rows.append([latitude, longitude, MARKER_STYLES[style]["icon"], MARKER_STYLES[style]["color"], tooltip_content, popup_content])
+        FastMarkerCluster(rows, callback=CLUSTER_MARKER_CALLBACK).add_to(m)
+        return m
+
+    for style, options in MARKER_STYLES.items():
+        features = [
+            {
+                "type": "Feature",
+                "id": f"{style}-{i}",
+                "geometry": {"type": "Point", "coordinates": [longitude, latitude]},
+                "properties": {"name": html.escape(name), "address": html.escape(address), "score": "" if score is None else f"{score:.2f}"},
+            }
+            for i, (latitude, longitude, name, address, marker_style, score) in enumerate(markers)
+            if marker_style == style
+        ]
+        if not features:
+            continue
+        folium.GeoJson(
+            {"type": "FeatureCollection", "features": features},
+            name=style,
+            marker=folium.Marker(icon=Icon(icon=options["icon"], icon_color="white", color=options["color"], prefix="fa")),
+            tooltip=folium.GeoJsonTooltip(fields=["name", "address"], labels=False),
+            popup=folium.GeoJsonPopup(fields=["name", "address", "score"], aliases=["", "", "Sensory score"]),
+        ).add_to(m)
+
+    return m
+
+def retry_unfinished():
+    """Have the next run of display_results fetch the places the deadline cut short."""
+    st.session_state["retry_unfinished"] = True
+
+@st.fragment
+def display_results(zoom_level):
+    """Show the stored search results as cards and a map.
+
+    Runs as a fragment, so its own interactions rerun only this section. Enriched places are kept
+    in session state, so reruns redraw them without calling the API again. Places that have not
+    been enriched yet are fetched right after a Find, within what is left of its deadline, and
+    when "Load the remaining details" is clicked, within a deadline of their own; any other rerun
+    makes no API calls. Places still without photos and reviews are marked as incomplete.
+    """
+    find_deadline = st.session_state.pop("find_deadline", None)
+    retrying = st.session_state.pop("retry_unfinished", False)
+    deadline = find_deadline or Deadline(FIND_DEADLINE_SECONDS)
+    coordinates = st.session_state.get("location_coordinates", [0, 0])
+    places = st.session_state["sensory_places"]
+    enriched = st.session_state.setdefault("enriched_places", {})
+    pending = [index for index, place in enumerate(places) if place.get("fsq_id", "") not in enriched]
+    fetching = pending if find_deadline or retrying else []
+
+    calls_saved = st.session_state.get("calls_saved", 0)
+    if calls_saved:
+        st.caption(f"Photos and reviews came with the search results, saving {calls_saved} API calls.")
+    missing_providers = st.session_state.get("missing_providers", [])
+    if missing_providers:
+        st.caption(f"No results from {', '.join(name.title() for name in missing_providers)} this time; showing the rest.")
+    incomplete_notice = st.empty()
+
+    # A card per result, shown as soon as the search returns; still-loading ones get a placeholder
+    card_placeholders = []
+    for place in places:
+        placeholder = st.empty()
+        with placeholder.container():
+            record = enriched.get(place.get("fsq_id", ""))
+            if record is not None:
+                display_place_info(record)
+            elif fetching:
+                st.subheader(place.get("name", "Unknown Place"))
+                st.caption("Loading photos and reviews...")
+        card_placeholders.append(placeholder)
+
+    # Draw the map from the search coordinates right away, centered on the user's location.
+    # returned_objects=[] stops panning and zooming from sending state back and rerunning the script.
+    map_placeholder = st.empty()
+    if fetching:
+        with map_placeholder.container():
+            st_folium(build_results_map(tuple(coordinates), zoom_level, map_markers(places, enriched)), width=800, height=500, key="results_map_preview", returned_objects=[])
+
+    # Fill in each card as its photos, reviews and accessibility arrive, until the deadline
+    new_records = {}
+    with deadline.stage("enrich"):
+        for fetching_index, record in iter_enriched_places([places[index] for index in fetching], deadline=deadline):
+            new_records[record.fsq_id] = record
+            with card_placeholders[fetching[fetching_index]].container():
+                display_place_info(record)
+    if fetching:
+        telemetry.record_stage("enrich", deadline.stages["enrich"])
+
+    score_enriched_places(list(new_records.values()))
+    enriched.update(new_records)
+
+    # Anything the deadline cut short is marked, and fetched again if the user asks for it
+    unfinished = [index for index in pending if places[index].get("fsq_id", "") not in enriched]
+    for index in unfinished:
+        with card_placeholders[index].container():
+            st.subheader(places[index].get("name", "Unknown Place"))
+            st.caption("Some details are still loading or unavailable.")
+    search_cut_short = st.session_state.get("search_cut_short", [])
+    if unfinished or search_cut_short:
+        with incomplete_notice.container():
+            if search_cut_short:
+                st.warning(f"{', '.join(name.title() for name in search_cut_short)} ran out of time; some places may be missing.")
+            if unfinished:
+                st.warning(f"Some details are still loading or unavailable for {len(unfinished)} of {len(places)} places.")
+                st.button("Load the remaining details", key="load_remaining_details", on_click=retry_unfinished)
+        if find_deadline:
+            telemetry.increment("finds_partial_total")
+    if new_records or find_deadline:
+        export_metrics()
+
+    # Redraw the map with markers showing accessibility and sensory score
+    with map_placeholder.container():
+        st_folium(build_results_map(tuple(coordinates), zoom_level, map_markers(places, enriched)), width=800, height=500, key="results_map", returned_objects=[])
+
 def business_selection():
     """Dropdown to select a business category."""
     selected_category = st.selectbox("Select a business category:", list(FOURSQUARE_CATEGORIES.keys()))
@@ -206,21 +783,7 @@ def explanation():
     st.write("""
     **Features:**  
     If a business has these _keywords_ in either their business profile or reviews then the establishment will be flagged as sensory friendly.
-    - ambiance
-    - autism
-    - booth
-    - calm
-    - cozy
-    - dim
-    - low lighting
-    - low noise
-    - not crowded
-    - peaceful
-    - quiet
-    - sensory-friendly
-    - soft music
-    - spacious
-    """)
+    """ + "\n".join(f"    - {keyword}" for keyword in SENSORY_KEYWORDS))
 
 def donate():
     # Creating an expander for Kofi
@@ -251,7 +814,7 @@ def donate():
 def main():
     """Main function to handle page navigation."""
     st.sidebar.title("Navigation")
-    page = st.sidebar.radio("Go to", ["Find", "Learn", "Contact", "Donate"])
+    page = st.sidebar.radio("Go to", ["Find", "Learn", "Contact", "Donate", "Ops"])
 
     logo_path = 'Media/sensory_heaven_logo.png' 
     st.logo(logo_path, size='large') 
@@ -263,84 +826,89 @@ def main():
         # User input fields
         location_input = st.text_input("Enter a location:", placeholder="e.g., Boston, MA")
 
+        # Autocomplete from the offline gazetteer; picking a suggestion replaces what was typed
+        suggestions = gazetteer.suggest(location_input) if location_input else []
+        if suggestions and location_input not in suggestions:
+            suggestion = st.selectbox("Did you mean:", suggestions, index=None, placeholder="Pick a suggestion (optional)")
+            if suggestion:
+                location_input = suggestion
+
         # Slider in miles (converted to meters)
         radius_miles = st.slider("Set the radius (miles):", 1, 10, 1, 1)  # min, max, default, step size (1 mile increments)
         radius = radius_miles * 1609  # Convert miles to meters
 
         category_id = business_selection() 
 
+        # More results means more pages from Foursquare, loaded one page at a time
+        max_results = st.select_slider("Maximum results:", options=SEARCH_RESULT_BUDGETS, value=SEARCH_RESULT_BUDGETS[0])
+
         if st.button("Find"):  # Button triggers API calls
             if location_input:
-                location = geocode_location(location_input)
+                # Every call for this Find, from geocoding to the last photo, draws on one time budget
+                deadline = Deadline(FIND_DEADLINE_SECONDS)
+
+                # The first provider geocodes; by default that's Foursquare's gazetteer and Nominatim
+                providers = search_providers() or [PROVIDERS[FoursquareProvider.name]]
+                with deadline.stage("geocode"):
+                    location = providers[0].geocode(location_input, deadline)
+                telemetry.record_stage("geocode", deadline.stages["geocode"])
                 if location:
                     coordinates = [location.latitude, location.longitude]
                     st.session_state["location_coordinates"] = coordinates  # Store location
                     
-                    # Fetch sensory-friendly places using converted meters
-                    sensory_places = get_sensory_friendly_places(
-                        location.latitude, 
-                        location.longitude, 
-                        radius=radius, 
-                        category_id=category_id
-                    )
+                    if place_store.covers(location.latitude, location.longitude, radius, category_id):
+                        # This area has been ingested offline, so the local place store answers without any API calls
+                        stored_places = [
+                            EnrichedPlace(**fields)
+                            for fields in place_store.query_radius(location.latitude, location.longitude, radius, category_id, limit=max_results)
+                        ]
+                        sensory_places = [record.details for record in stored_places]
+                        enriched_places = {record.fsq_id: record for record in stored_places}
+                        calls_saved = 0
+                        st.session_state["missing_providers"] = []
+                        st.session_state["search_cut_short"] = []
+                    else:
+                        # Fetch sensory-friendly places using converted meters from every provider at once,
+                        # one page at a time; pages still to come at the deadline are left out
+                        sensory_places = []
+                        progress = st.empty()
+                        search = FederatedSearch(providers, initializer=script_context_initializer())
+                        with deadline.stage("search"):
+                            for page in search.pages(
+                                location.latitude, 
+                                location.longitude, 
+                                radius=radius, 
+                                category_id=category_id,
+                                max_results=max_results,
+                                deadline=deadline,
+                            ):
+                                sensory_places.extend(page)
+                                progress.caption(f"Loaded {len(sensory_places)} places...")
+                        telemetry.record_stage("search", deadline.stages["search"])
+                        progress.empty()
+                        st.session_state["missing_providers"] = search.failed
+                        st.session_state["search_cut_short"] = search.incomplete
+                        enriched_places = {}
+                        calls_saved = sum(inline_calls_saved(place) for place in sensory_places)
+                        telemetry.increment("foursquare_calls_saved_total", calls_saved)
 
                     st.session_state["sensory_places"] = sensory_places  # Store places
+                    st.session_state["enriched_places"] = enriched_places  # Places that need no further API calls
+                    st.session_state["calls_saved"] = calls_saved  # Per-place calls the inline search fields made unnecessary
+                    st.session_state["find_deadline"] = deadline  # What's left of it goes to photos and reviews
+                    telemetry.increment("finds_total")
+                elif deadline.expired:
+                    st.error("Finding that location took too long. Please try again.")
                 else:
                     st.error("Unable to geocode the location. Please try again.")
 
         # Display results if they exist in session state
         if "sensory_places" in st.session_state and st.session_state["sensory_places"]:
-            coordinates = st.session_state.get("location_coordinates", [0, 0])
-            
             # Dynamically adjust the zoom level based on radius
             # If radius is smaller (1 mile), use a higher zoom level (e.g., 15)
             # If radius is larger (10 miles), use a lower zoom level (e.g., 12)
             zoom_level = 15 - (radius_miles - 1)
-            
-            # Center map based on user location input
-            m = folium.Map(location=coordinates, zoom_start=zoom_level)
-
-            for place in st.session_state["sensory_places"]:
-                name = place.get("name", "Unknown Place")
-                address = place.get("location", {}).get("address", "Address not available")
-                latitude = place.get("geocodes", {}).get("main", {}).get("latitude")
-                longitude = place.get("geocodes", {}).get("main", {}).get("longitude")
-                photo_urls = get_place_photos(place.get("fsq_id", ""))
-                reviews = get_place_reviews(place.get("fsq_id", ""))
-                accessible = is_accessible(place)
-
-                # Set icon based on accessibility
-                if accessible:
-                    icon = Icon(
-                        icon="wheelchair",  
-                        icon_color="white",
-                        color="blue",  
-                        prefix="fa"
-                    )
-                else:
-                    icon = Icon(
-                        icon="smile",
-                        icon_color="white",
-                        color="green", 
-                        prefix="fa"
-                    )
-                    
-                tooltip_content = f"<b>{name}</b><br>{address}"
-                if latitude and longitude:
-                    popup_content = f"<b>{name}</b><br>{address}"
-                    folium.Marker(
-                        [latitude, longitude], 
-                        popup=popup_content, 
-                        icon=icon,  # Use the icon defined above
-                        tooltip=tooltip_content  
-                    ).add_to(m)
-
-                display_place_info(name, address, photo_urls, reviews)
-
-            # Display map with sensory-friendly places and markers
-            st_folium(m, width=800, height=500)
-        else:
-            pass
+            display_results(zoom_level)
 
 
     elif page == "Learn":
@@ -355,6 +923,11 @@ def main():
         donate()
         credit()
 
+    elif page == "Ops":
+        st.title("Sensory Heaven - Ops")
+        st.logo(logo_path, size='large') 
+        ops_page()
+
     elif page == "Contact":
         st.title("Sensory Heaven - Contact")
         st.logo(logo_path, size='large') 
@@ -0,0 +1,137 @@
+# Offline gazetteer: common "City, ST" names resolved to coordinates with no network call,
+# plus prefix-trie autocomplete for the location box.
+#
+# The data ships as a compact binary file (GAZETTEER_PATH in config.py), rebuilt from a CSV with
+# city,state,latitude,longitude columns, ordered most prominent first:
+#   python gazetteer.py build data/us_cities.csv data/gazetteer.bin
+import csv
+import gzip
+import struct
+import sys
+import threading
+from geocoding import GeocodedLocation, normalize_query
+from config import GAZETTEER_PATH
+
+MAGIC = b"GAZ1"
+HEADER = struct.Struct("<4sI")  # magic, number of places
+RECORD = struct.Struct("<ffB")  # latitude, longitude, length of the UTF-8 "City, ST" name that follows
+
+US_STATES = {
+    "AL": "Alabama", "AK": "Alaska", "AZ": "Arizona", "AR": "Arkansas", "CA": "California",
+    "CO": "Colorado", "CT": "Connecticut", "DE": "Delaware", "DC": "District of Columbia",
+    "FL": "Florida", "GA": "Georgia", "HI": "Hawaii", "ID": "Idaho", "IL": "Illinois",
+    "IN": "Indiana", "IA": "Iowa", "KS": "Kansas", "KY": "Kentucky", "LA": "Louisiana",
+    "ME": "Maine", "MD": "Maryland", "MA": "Massachusetts", "MI": "Michigan", "MN": "Minnesota",
+    "MS": "Mississippi", "MO": "Missouri", "MT": "Montana", "NE": "Nebraska", "NV": "Nevada",
+    "NH": "New Hampshire", "NJ": "New Jersey", "NM": "New Mexico", "NY": "New York",
+    "NC": "North Carolina", "ND": "North Dakota", "OH": "Ohio", "OK": "Oklahoma", "OR": "Oregon",
+    "PA": "Pennsylvania", "RI": "Rhode Island", "SC": "South Carolina", "SD": "South Dakota",
+    "TN": "Tennessee", "TX": "Texas", "UT": "Utah", "VT": "Vermont", "VA": "Virginia",
+    "WA": "Washington", "WV": "West Virginia", "WI": "Wisconsin", "WY": "Wyoming",
+}
+
+# Loaded on first use: the places, the exact-match index and the autocomplete trie
+_gazetteer = None
+_load_lock = threading.Lock()
+
+class PrefixTrie:
+    """Prefix trie over normalized names; every node keeps its best few matches, so a lookup is one walk."""
+
+    def __init__(self, max_suggestions=5):
+        self.max_suggestions = max_suggestions
+        self.root = {"children": {}, "top": []}
+
+    def insert(self, key, index):
+        """Add an entry under key. Entries must be inserted best first."""
+        node = self.root
+        for char in key:
+            if len(node["top"]) < self.max_suggestions and index not in node["top"]:
+                node["top"].append(index)
+            node = node["children"].setdefault(char, {"children": {}, "top": []})
+        if len(node["top"]) < self.max_suggestions and index not in node["top"]:
+            node["top"].append(index)
+
+    def search(self, prefix):
+        """Indexes of the best entries whose key starts with prefix."""
+        node = self.root
+        for char in prefix:
+            node = node["children"].get(char)
+            if node is None:
+                return []
+        return node["top"]
+
+def aliases(city, state):
+    """Normalized spellings a place can be typed as, most specific first."""
+    state_name = US_STATES.get(state, state)
+    return [normalize_query(f"{city} {state}"), normalize_query(f"{city} {state_name}"), normalize_query(city)]
+
+def load(path=GAZETTEER_PATH):
+    """Read the binary gazetteer into a list of (name, latitude, longitude)."""
+    with gzip.open(path, "rb") as f:
+        data = f.read()
+    magic, count = HEADER.unpack_from(data, 0)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a gazetteer file")
+
+    places, offset = [], HEADER.size
+    for _ in range(count):
+        latitude, longitude, length = RECORD.unpack_from(data, offset)
+        offset += RECORD.size
+        places.append((data[offset:offset + length].decode("utf-8"), latitude, longitude))
+        offset += length
+    return places
+
+def _get_gazetteer():
+    """Load the gazetteer and build its indexes on first use."""
+    global _gazetteer
+    if _gazetteer is None:
+        with _load_lock:
+            if _gazetteer is None:
+                places = load()
+                exact, trie = {}, PrefixTrie()
+                for index, (name, _, _) in enumerate(places):
+                    city, _, state = name.rpartition(", ")
+                    for key in aliases(city, state):
+                        # A bare city name belongs to its most prominent place ("portland" is Portland, OR)
+                        exact.setdefault(key, index)
+                        trie.insert(key, index)
+                _gazetteer = (places, exact, trie)
+    return _gazetteer
+
+def lookup(query):
+    """Return a GeocodedLocation for a known city name, or None when the geocoder is needed."""
+    places, exact, _ = _get_gazetteer()
+    index = exact.get(normalize_query(query))
+    if index is None:
+        return None
+    name, latitude, longitude = places[index]
+    # Stored as float32, so drop the noise past the 4 decimals (~10 m) the data has
+    return GeocodedLocation(round(latitude, 4), round(longitude, 4), name)
+
+def suggest(prefix, limit=5):
+    """Up to limit "City, ST" names starting with what the user has typed so far."""
+    key = normalize_query(prefix)
+    if not key:
+        return []
+    places, _, trie = _get_gazetteer()
+    return [places[index][0] for index in trie.search(key)[:limit]]
+
+def build(csv_path, out_path):
+    """Write the binary gazetteer from a CSV of city,state,latitude,longitude rows."""
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+
+    chunks = [HEADER.pack(MAGIC, len(rows))]
+    for row in rows:
+        name = f"{row['city']}, {row['state']}".encode("utf-8")
+        chunks.append(RECORD.pack(float(row["latitude"]), float(row["longitude"]), len(name)))
+        chunks.append(name)
+
+    with gzip.open(out_path, "wb", compresslevel=9) as f:
+        f.write(b"".join(chunks))
+    return len(rows)
+
+if __name__ == "__main__":
+    if len(sys.argv) != 4 or sys.argv[1] != "build":
+        sys.exit("usage: python gazetteer.py build <cities.csv> <gazetteer.bin>")
+    print(f"wrote {build(sys.argv[2], sys.argv[3])} places to {sys.argv[3]}")
@@ -0,0 +1,111 @@
+import math
+
+GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+EARTH_RADIUS_M = 6371008.8
+METERS_PER_DEGREE = math.pi * EARTH_RADIUS_M / 180
+
+def haversine_m(lat1, lng1, lat2, lng2):
+    """Great-circle distance between two points in meters."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlmb = math.radians(lng2 - lng1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+def geohash_encode(latitude, longitude, precision):
+    """Encode a point as a geohash string of the given length."""
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, bit_count, even = [], 0, 0, True
+    while len(chars) < precision:
+        rng, value = (lng_range, longitude) if even else (lat_range, latitude)
+        mid = (rng[0] + rng[1]) / 2
+        if value >= mid:
+            bits = bits * 2 + 1
+            rng[0] = mid
+        else:
+            bits = bits * 2
+            rng[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(GEOHASH_ALPHABET[bits])
+            bits, bit_count = 0, 0
+    return "".join(chars)
+
+def geohash_bounds(geohash):
+    """Return (south, west, north, east) of a geohash cell."""
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    even = True
+    for char in geohash:
+        value = GEOHASH_ALPHABET.index(char)
+        for shift in range(4, -1, -1):
+            rng = lng_range if even else lat_range
+            mid = (rng[0] + rng[1]) / 2
+            if (value >> shift) & 1:
+                rng[0] = mid
+            else:
+                rng[1] = mid
+            even = not even
+    return lat_range[0], lng_range[0], lat_range[1], lng_range[1]
+
+def geohash_center(geohash):
+    """Return the (latitude, longitude) center of a geohash cell."""
+    south, west, north, east = geohash_bounds(geohash)
+    return (south + north) / 2, (west + east) / 2
+
+def geohash_neighbors(geohash):
+    """Return the up to 8 cells of the same precision surrounding a geohash cell."""
+    south, west, north, east = geohash_bounds(geohash)
+    lat, lng = (south + north) / 2, (west + east) / 2
+    dlat, dlng = north - south, east - west
+    neighbors = []
+    for i in (-1, 0, 1):
+        for j in (-1, 0, 1):
+            if i == j == 0 or not -90 < lat + i * dlat < 90:
+                continue
+            neighbor_lng = (lng + j * dlng + 180) % 360 - 180
+            neighbors.append(geohash_encode(lat + i * dlat, neighbor_lng, len(geohash)))
+    return neighbors
+
+def cell_size_m(precision, latitude=0.0):
+    """Height and width of a geohash cell in meters at the given latitude."""
+    lng_bits = math.ceil(5 * precision / 2)
+    lat_bits = 5 * precision - lng_bits
+    height = 180 / 2 ** lat_bits * METERS_PER_DEGREE
+    width = 360 / 2 ** lng_bits * METERS_PER_DEGREE * math.cos(math.radians(latitude))
+    return height, width
+
+def precision_for_radius(radius_m, latitude=0.0, fraction=0.5, max_precision=9):
+    """Coarsest geohash precision whose cells are no larger than fraction * radius on either side."""
+    for precision in range(1, max_precision + 1):
+        height, width = cell_size_m(precision, latitude)
+        if max(height, width) <= radius_m * fraction:
+            return precision
+    return max_precision
+
+def cells_in_bbox(south, west, north, east, precision):
+    """Return the geohash cells of the given precision that cover a bounding box, row by row."""
+    cell_south, cell_west, cell_north, cell_east = geohash_bounds(geohash_encode(south, west, precision))
+    dlat, dlng = cell_north - cell_south, cell_east - cell_west
+    cells, seen = [], set()
+    lat = south
+    while True:
+        lng = west
+        while True:
+            cell = geohash_encode(min(lat, north), min(lng, east), precision)
+            if cell not in seen:
+                seen.add(cell)
+                cells.append(cell)
+            if lng >= east:
+                break
+            lng = min(lng + dlng, east)
+        if lat >= north:
+            break
+        lat = min(lat + dlat, north)
+    return cells
+
+def bbox_around(latitude, longitude, radius_m):
+    """Return the (south, west, north, east) box enclosing a circle."""
+    dlat = radius_m / METERS_PER_DEGREE
+    dlng = radius_m / (METERS_PER_DEGREE * max(math.cos(math.radians(latitude)), 1e-6))
+    return max(latitude - dlat, -90.0), longitude - dlng, min(latitude + dlat, 90.0), longitude + dlng
@@ -0,0 +1,118 @@
+import re
+import threading
+import time
+from collections import namedtuple
+import json
+from geopy.adapters import RequestsAdapter
+from geopy.exc import GeopyError, GeocoderQuotaExceeded, GeocoderServiceError
+from geopy.geocoders import Nominatim
+import response_cache
+from cassette import get_cassette, interaction_key
+import telemetry
+from deadline import DeadlineExceeded
+from singleflight import geocoding_flights, WaitTimedOut
+from scheduler import scheduler, PRIORITY_SEARCH
+from config import (
+    NOMINATIM_USER_AGENT,
+    NOMINATIM_TIMEOUT,
+    NOMINATIM_DOMAIN,
+    NOMINATIM_SCHEME,
+    SCHEDULER_MAX_WAIT,
+)
+
+GeocodedLocation = namedtuple("GeocodedLocation", ["latitude", "longitude", "address"])
+
+class CassetteAdapter(RequestsAdapter):
+    """geopy's requests adapter, recording to or replaying from the HTTP cassette."""
+
+    def get_json(self, url, *, timeout, headers):
+        cassette = get_cassette()
+        key = interaction_key(url)
+        if cassette.replaying:
+            interaction = cassette.play(key)
+            if interaction is None:
+                raise GeocoderServiceError(f"No recorded response for {url}")
+            return json.loads(interaction["body"])
+
+        started = time.perf_counter()
+        data = super().get_json(url, timeout=timeout, headers=headers)
+        cassette.record(key, 200, {"Content-Type": "application/json"}, json.dumps(data).encode("utf-8"), time.perf_counter() - started)
+        return data
+
+# One Nominatim client for the whole process
+_geolocator = None
+_geolocator_lock = threading.Lock()
+
+def get_geolocator():
+    """Return the shared Nominatim client, creating it on first use."""
+    global _geolocator
+    if _geolocator is None:
+        with _geolocator_lock:
+            if _geolocator is None:
+                _geolocator = Nominatim(
+                    user_agent=NOMINATIM_USER_AGENT, timeout=NOMINATIM_TIMEOUT, domain=NOMINATIM_DOMAIN, scheme=NOMINATIM_SCHEME,
+                    adapter_factory=CassetteAdapter if get_cassette() is not None else None,
+                )
+    return _geolocator
+
+def normalize_query(query):
+    """Lowercase a query and strip punctuation and extra spaces, so "Boston, MA" and "boston ma" match."""
+    return " ".join(re.sub(r"[^\w\s]", " ", query.lower().replace("'", "")).split())
+
+def _lookup(query, deadline=None):
+    """Ask Nominatim for a query, within the "nominatim" budget of the shared scheduler (1 request per second).
+
+    Replayed lookups never reach Nominatim, so they skip the budget. With a deadline, the wait
+    for a token and the request timeout are capped at the time it has left.
+    """
+    cassette = get_cassette()
+    wait = SCHEDULER_MAX_WAIT if deadline is None else deadline.cap(SCHEDULER_MAX_WAIT)
+    if not (cassette is not None and cassette.replaying) and not scheduler.acquire("nominatim", PRIORITY_SEARCH, wait):
+        telemetry.record_request("nominatim", "search", "dropped", 0)
+        raise GeocoderQuotaExceeded("Nominatim request budget exhausted")
+    if deadline is not None and deadline.expired:
+        telemetry.record_request("nominatim", "search", "deadline", 0)
+        deadline.check("geocoding")
+    started = time.perf_counter()
+    try:
+        location = get_geolocator().geocode(query, timeout=NOMINATIM_TIMEOUT if deadline is None else deadline.cap(NOMINATIM_TIMEOUT))
+    except GeopyError:
+        expired = deadline is not None and deadline.expired
+        telemetry.record_request("nominatim", "search", "deadline" if expired else "error", time.perf_counter() - started)
+        if expired:
+            deadline.check("the geocoding response")
+        raise
+    telemetry.record_request("nominatim", "search", "200" if location else "not_found", time.perf_counter() - started)
+    if location is None:
+        return None
+    return GeocodedLocation(location.latitude, location.longitude, location.address)
+
+def geocode(query, deadline=None):
+    """Geocode a free-text location, answering from the persistent cache when possible.
+
+    Returns a GeocodedLocation, or None when the location is unknown or Nominatim can't be reached
+    (before the deadline, when one is given).
+    """
+    normalized = normalize_query(query)
+    if not normalized:
+        return None
+
+    cache_key = f"nominatim:{normalized}"
+    cached = response_cache.get(cache_key)
+    telemetry.record_cache("geocode", cached is not None)
+    if cached is not None:
+        return GeocodedLocation(*cached["location"]) if cached["location"] else None
+
+    try:
+        # Identical lookups already in flight in this process wait for that request instead of sending
+        # their own, for as long as their own deadline allows; if the leader's deadline ran out first,
+        # they try again. The first caller's spelling is sent, as Nominatim handles punctuation better than we would.
+        location = geocoding_flights.do(
+            normalized, lambda: _lookup(query, deadline),
+            timeout=None if deadline is None else deadline.remaining(), retry_on=(DeadlineExceeded,),
+        )
+    except (GeopyError, DeadlineExceeded, WaitTimedOut):
+        return None
+
+    response_cache.put(cache_key, "geocode", {"location": list(location) if location else None})
+    return location
@@ -0,0 +1,87 @@
+# Offline ingestion: sweeps a city's bounding box and fills the local place store (place_store.py),
+# so Find can answer searches there without calling Foursquare.
+#
+# Usage (from the repo root, with FOURSQUARE_API_KEY set):
+#   python ingest.py --bbox 42.23,-71.19,42.40,-70.99
+#   python ingest.py --bbox 42.23,-71.19,42.40,-70.99 --categories Cafe Library --rate 2
+#
+# Every finished (cell, category) pair is checkpointed, so an interrupted run picks up where it stopped.
+# A cell whose search failed is not checkpointed, so the next run tries it again.
+import argparse
+import math
+import time
+import api_client
+import geo
+import place_store
+import telemetry
+from config import (
+    FOURSQUARE_CATEGORIES,
+    PLACE_STORE_PRECISION,
+    INGEST_RATE_LIMIT,
+    INGEST_MAX_RESULTS_PER_CELL,
+)
+from foursquare_app import get_sensory_friendly_places, enrich_places
+
+def cell_radius(cell):
+    """Radius in meters of the circle around a cell's center that covers the whole cell."""
+    latitude, _ = geo.geohash_center(cell)
+    height, width = geo.cell_size_m(len(cell), latitude)
+    return math.ceil(math.hypot(height, width) / 2)
+
+def failed_searches():
+    """Foursquare search requests so far in this process that did not get a 200 (errors, drops and replay misses included)."""
+    return sum(
+        count for (provider, endpoint, status), count in telemetry.snapshot()["requests"].items()
+        if provider == "foursquare" and endpoint == "search" and status != "200"
+    )
+
+def ingest_cell(cell, category_id, max_results):
+    """Search, enrich and score the places of one cell and category, then save them.
+
+    Returns the number of places saved, or None when a search request failed; the app's fetch
+    path reports failures as empty results, so they are told apart by the request telemetry.
+    """
+    latitude, longitude = geo.geohash_center(cell)
+    failed_before = failed_searches()
+    places = get_sensory_friendly_places(latitude, longitude, radius=cell_radius(cell), category_id=category_id, max_results=max_results)
+    if failed_searches() > failed_before:
+        return None
+    records = enrich_places(places)
+    saved = place_store.save_places(list({record.fsq_id: record for record in records}.values()), category_id)
+    place_store.mark_covered(cell, category_id, saved)
+    return saved
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep a bounding box into the local place store.")
+    parser.add_argument("--bbox", required=True, help="south,west,north,east in decimal degrees")
+    parser.add_argument("--categories", nargs="+", default=list(FOURSQUARE_CATEGORIES), choices=list(FOURSQUARE_CATEGORIES))
+    parser.add_argument("--rate", type=float, default=INGEST_RATE_LIMIT, help="Foursquare requests per second")
+    parser.add_argument("--max-results", type=int, default=INGEST_MAX_RESULTS_PER_CELL, help="places fetched per cell and category")
+    parser.add_argument("--refresh", action="store_true", help="re-ingest cells that are already covered")
+    args = parser.parse_args()
+
+    south, west, north, east = (float(value) for value in args.bbox.split(","))
+    cells = geo.cells_in_bbox(south, west, north, east, PLACE_STORE_PRECISION)
+    print(f"{len(cells)} cells x {len(args.categories)} categories")
+
+    for category in args.categories:
+        category_id = FOURSQUARE_CATEGORIES[category]
+        done = set() if args.refresh else place_store.covered_cells(category_id)
+        for i, cell in enumerate(cells, 1):
+            if cell in done:
+                continue
+
+            attempts_before = api_client.stats()["attempts"]
+            started = time.monotonic()
+            saved = ingest_cell(cell, category_id, args.max_results)
+            calls = api_client.stats()["attempts"] - attempts_before
+            if saved is None:
+                print(f"[{category}] {i}/{len(cells)} {cell}: search failed after {calls} requests, left for the next run")
+            else:
+                print(f"[{category}] {i}/{len(cells)} {cell}: {saved} places, {calls} requests")
+
+            # Stay under the request rate: this cell's requests must take at least calls / rate seconds
+            time.sleep(max(calls / args.rate - (time.monotonic() - started), 0))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+import re
+from config import SENSORY_KEYWORDS, ACCESSIBLE_KEYWORDS
+
+# Spaces and hyphens between the words of a keyword are interchangeable
+WORD_SEPARATOR = r"[\s-]+"
+
+class KeywordMatcher:
+    """Finds any of a list of keywords in text with a single precompiled regex.
+
+    Matching is case-insensitive and on whole words, allows a plural "s" (not "es", so "dim" doesn't match "dimes"), and treats
+    spaces and hyphens inside a keyword alike ("low noise" matches "low-noise").
+    """
+
+    def __init__(self, keywords):
+        self.keywords = list(keywords)
+        # One named group per keyword so a match can be mapped back to the keyword it came from.
+        # Longer keywords go first so "low lighting" wins over a shorter overlapping keyword.
+        order = sorted(range(len(self.keywords)), key=lambda i: -len(self.keywords[i]))
+        alternatives = []
+        for i in order:
+            words = re.split(WORD_SEPARATOR, self.keywords[i].strip())
+            alternatives.append(f"(?P<k{i}>{WORD_SEPARATOR.join(re.escape(word) for word in words)})")
+        self.pattern = re.compile(rf"\b(?:{'|'.join(alternatives)})s?\b", re.IGNORECASE)
+
+    def find_all(self, text):
+        """Return (keyword, start, end) for every keyword occurrence in the text."""
+        if not text:
+            return []
+        return [(self.keywords[int(m.lastgroup[1:])], m.start(), m.end()) for m in self.pattern.finditer(text)]
+
+    def keywords_in(self, *texts):
+        """Return the set of keywords found in any of the texts."""
+        return {keyword for text in texts for keyword, _, _ in self.find_all(text)}
+
+    def matches(self, *texts):
+        """True when any keyword occurs in any of the texts."""
+        return any(text and self.pattern.search(text) for text in texts)
+
+# Built once at import time and shared by every session
+sensory_matcher = KeywordMatcher(SENSORY_KEYWORDS)
+accessible_matcher = KeywordMatcher(ACCESSIBLE_KEYWORDS)
@@ -0,0 +1,118 @@
+import hashlib
+import io
+import os
+import threading
+import time
+import requests
+from PIL import Image
+import api_client
+import telemetry
+from deadline import Deadline, DeadlineExceeded
+from scheduler import PRIORITY_PHOTOS
+from singleflight import photo_flights, WaitTimedOut
+from config import (
+    PHOTO_CACHE_DIR,
+    PHOTO_CACHE_MAX_BYTES,
+    PHOTO_THUMBNAIL_SIZE,
+    PHOTO_THUMBNAIL_QUALITY,
+    PHOTO_FETCH_DEADLINE_SECONDS,
+)
+
+# Eviction lists the whole directory, so it only runs every few writes
+EVICTION_CHECK_INTERVAL = 20
+
+_writes = 0
+_writes_lock = threading.Lock()
+
+def _path_for(url):
+    return os.path.join(PHOTO_CACHE_DIR, hashlib.sha1(url.encode("utf-8")).hexdigest() + ".jpg")
+
+def make_thumbnail(data):
+    """Shrink an image to fit PHOTO_THUMBNAIL_SIZE and recompress it as JPEG."""
+    image = Image.open(io.BytesIO(data))
+    image.thumbnail(PHOTO_THUMBNAIL_SIZE)
+    output = io.BytesIO()
+    image.convert("RGB").save(output, format="JPEG", quality=PHOTO_THUMBNAIL_QUALITY, optimize=True)
+    return output.getvalue()
+
+def get_thumbnail(url, deadline=None, provider=None, params=None):
+    """Return thumbnail bytes for a photo URL, downloading it only the first time.
+
+    Concurrent requests for the same photo share one download. The download runs while the card
+    is drawn, so it gets PHOTO_FETCH_DEADLINE_SECONDS unless a deadline is given.
+    A provider's photos (e.g. Google's, which are billed) are downloaded within its request
+    budget; params are added to the request only, so secrets such as an API key are never
+    part of the URL, the cache file name or a cassette.
+    Returns None when the photo can't be downloaded or decoded in time.
+    """
+    deadline = deadline or Deadline(PHOTO_FETCH_DEADLINE_SECONDS)
+    try:
+        return photo_flights.do(
+            url, lambda: _get_thumbnail(url, deadline, provider, params), timeout=deadline.remaining(), retry_on=(DeadlineExceeded,),
+        )
+    except (DeadlineExceeded, WaitTimedOut):
+        return None
+
+def _get_thumbnail(url, deadline, provider=None, params=None):
+    path = _path_for(url)
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+        os.utime(path)  # the modification time tracks the last use, for LRU eviction
+        return data
+    except FileNotFoundError:
+        pass
+
+    started = time.perf_counter()
+    try:
+        response = api_client.get(url, params=params, provider=provider, priority=PRIORITY_PHOTOS, deadline=deadline)
+    except DeadlineExceeded:
+        telemetry.record_request(provider or "cdn", "photo", "deadline", time.perf_counter() - started)
+        raise  # so photo_flights lets anyone waiting with time left try again
+    except requests.RequestException:
+        telemetry.record_request(provider or "cdn", "photo", "error", time.perf_counter() - started)
+        return None
+    telemetry.record_request(provider or "cdn", "photo", response.status_code, time.perf_counter() - started, len(response.content))
+    if response.status_code != 200:
+        return None
+    try:
+        data = make_thumbnail(response.content)
+    except Exception:
+        return None  # anything Pillow can't or won't decode: truncated, unknown format, a decompression bomb, ...
+
+    # Written under a temporary name first, so other processes never read half a file
+    os.makedirs(PHOTO_CACHE_DIR, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+    global _writes
+    with _writes_lock:
+        _writes += 1
+        check = _writes % EVICTION_CHECK_INTERVAL == 0
+    if check:
+        evict()
+    return data
+
+def evict(max_bytes=PHOTO_CACHE_MAX_BYTES):
+    """Delete the least recently used thumbnails until the cache fits in max_bytes."""
+    entries = []
+    with os.scandir(PHOTO_CACHE_DIR) as it:
+        for entry in it:
+            if entry.name.endswith(".jpg"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+        removed += 1
+    return removed
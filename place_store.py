@@ -0,0 +1,141 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import asdict
+import geo
+from config import (
+    PLACE_STORE_PATH,
+    PLACE_STORE_PRECISION,
+    PLACE_STORE_MAX_AGE,
+)
+
+_local = threading.local()
+
+def _connect():
+    """Return this thread's connection to the place store, creating the schema on first use."""
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        os.makedirs(os.path.dirname(PLACE_STORE_PATH) or ".", exist_ok=True)
+        conn = sqlite3.connect(PLACE_STORE_PATH, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS places (
+                fsq_id TEXT PRIMARY KEY,
+                latitude REAL NOT NULL,
+                longitude REAL NOT NULL,
+                accessible INTEGER NOT NULL,
+                sensory_score REAL NOT NULL,
+                record TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS places_latitude ON places (latitude);
+            -- R*Tree spatial index over the places' coordinates, keyed by the places rowid.
+            -- It lives in the same file, so it is kept up to date on every save and never rebuilt on restart.
+            CREATE VIRTUAL TABLE IF NOT EXISTS places_rtree USING rtree (id, min_lat, max_lat, min_lng, max_lng);
+            CREATE TABLE IF NOT EXISTS place_categories (
+                fsq_id TEXT NOT NULL,
+                category_id TEXT NOT NULL,
+                PRIMARY KEY (fsq_id, category_id)
+            );
+            -- One row per (geohash cell, category) swept by the ingestion command.
+            -- It doubles as the checkpoint for resuming an interrupted run.
+            CREATE TABLE IF NOT EXISTS coverage (
+                cell TEXT NOT NULL,
+                category_id TEXT NOT NULL,
+                places INTEGER NOT NULL,
+                ingested_at REAL NOT NULL,
+                PRIMARY KEY (cell, category_id)
+            );
+        """)
+        # Stores created before the spatial index existed get it filled once
+        if conn.execute("SELECT NOT EXISTS (SELECT 1 FROM places_rtree) AND EXISTS (SELECT 1 FROM places)").fetchone()[0]:
+            conn.execute("INSERT INTO places_rtree SELECT rowid, latitude, latitude, longitude, longitude FROM places")
+        _local.conn = conn
+    return conn
+
+def save_places(records, category_id):
+    """Insert or update EnrichedPlace records under a category; places without coordinates are skipped."""
+    now = time.time()
+    rows, category_rows = [], []
+    for record in records:
+        if record.latitude is None or record.longitude is None:
+            continue
+        rows.append((
+            record.fsq_id, record.latitude, record.longitude, int(record.accessible),
+            record.sensory_score, json.dumps(asdict(record), separators=(",", ":")), now,
+        ))
+        category_rows.append((record.fsq_id, category_id))
+
+    conn = _connect()
+    with conn:
+        conn.execute("BEGIN")
+        # An upsert keeps the place's rowid, which is its id in the spatial index
+        conn.executemany("""
+            INSERT INTO places VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (fsq_id) DO UPDATE SET
+                latitude = excluded.latitude, longitude = excluded.longitude, accessible = excluded.accessible,
+                sensory_score = excluded.sensory_score, record = excluded.record, updated_at = excluded.updated_at
+        """, rows)
+        conn.executemany(
+            "INSERT OR REPLACE INTO places_rtree SELECT rowid, latitude, latitude, longitude, longitude FROM places WHERE fsq_id = ?",
+            [(row[0],) for row in rows],
+        )
+        conn.executemany("INSERT OR IGNORE INTO place_categories VALUES (?, ?)", category_rows)
+    return len(rows)
+
+def mark_covered(cell, category_id, places):
+    """Record that a cell has been swept for a category."""
+    _connect().execute("INSERT OR REPLACE INTO coverage VALUES (?, ?, ?, ?)", (cell, category_id, places, time.time()))
+
+def covered_cells(category_id, max_age=PLACE_STORE_MAX_AGE):
+    """Cells swept for a category recently enough to answer searches from."""
+    rows = _connect().execute(
+        "SELECT cell FROM coverage WHERE category_id = ? AND ingested_at > ?", (category_id, time.time() - max_age)
+    )
+    return {row[0] for row in rows}
+
+def covers(latitude, longitude, radius, category_id):
+    """True when every store cell touching the search circle has been swept for the category."""
+    cells = geo.cells_in_bbox(*geo.bbox_around(latitude, longitude, radius), PLACE_STORE_PRECISION)
+    return set(cells) <= covered_cells(category_id)
+
+def _bbox_rows(south, west, north, east, category_id):
+    """(latitude, longitude, record) of the stored places of a category inside a bounding box, best score first."""
+    # CROSS JOIN makes SQLite start from the R*Tree instead of the latitude index.
+    # Overlap tests rather than containment, since the R*Tree rounds coordinates outwards to 32-bit floats;
+    # the exact coordinates are checked again below.
+    rows = _connect().execute("""
+        SELECT p.latitude, p.longitude, p.record FROM places_rtree r
+        CROSS JOIN places p ON p.rowid = r.id
+        CROSS JOIN place_categories c ON c.fsq_id = p.fsq_id AND c.category_id = ?
+        WHERE r.max_lat >= ? AND r.min_lat <= ? AND r.max_lng >= ? AND r.min_lng <= ?
+        ORDER BY p.sensory_score DESC
+    """, (category_id, south, north, west, east))
+    return [row for row in rows if south <= row[0] <= north and west <= row[1] <= east]
+
+def query_bbox(south, west, north, east, category_id, limit=None):
+    """Stored places of a category inside a bounding box, best sensory score first.
+
+    Returns the fields each record was saved with, ready for EnrichedPlace(**fields).
+    """
+    places = []
+    for _, _, record in _bbox_rows(south, west, north, east, category_id):
+        places.append(json.loads(record))
+        if limit and len(places) >= limit:
+            break
+    return places
+
+def query_radius(latitude, longitude, radius, category_id, limit=None):
+    """Stored places of a category within radius meters, best sensory score first.
+
+    Returns the fields each record was saved with, ready for EnrichedPlace(**fields).
+    """
+    places = []
+    for lat, lng, record in _bbox_rows(*geo.bbox_around(latitude, longitude, radius), category_id):
+        if geo.haversine_m(latitude, longitude, lat, lng) <= radius:
+            places.append(json.loads(record))
+            if limit and len(places) >= limit:
+                break
+    return places
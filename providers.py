@@ -0,0 +1,266 @@
+import os
+import queue
+import re
+import threading
+import time
+import unicodedata
+from abc import ABC, abstractmethod
+import requests
+import api_client
+import geo
+import photo_cache
+import response_cache
+import telemetry
+from cassette import CassetteMiss
+from deadline import DeadlineExceeded
+from geocoding import GeocodedLocation
+from scheduler import PRIORITY_SEARCH
+from config import (
+    FOURSQUARE_CATEGORIES,
+    SENSORY_KEYWORDS,
+    FEDERATED_SEARCH_TIMEOUT,
+    DEDUPE_DISTANCE_M,
+    GOOGLE_MAPS_API_PLACES,
+    GOOGLE_MAPS_API_NEARBY,
+    GOOGLE_MAPS_API_URL_PHOTOS,
+    GOOGLE_CATEGORY_TYPES,
+)
+
+class ProviderError(Exception):
+    """A provider's API answered, but not with results."""
+
+class PlaceProvider(ABC):
+    """A source of places for a Find.
+
+    Search results are Foursquare-shaped dicts (fsq_id, name, geocodes.main, location.address,
+    categories, rating, ...) with a "provider" key naming the provider, so the rest of the app
+    handles every provider's places alike.
+
+    Every call takes an optional Deadline; a call that runs out of time raises DeadlineExceeded,
+    except geocode(), which returns None.
+    """
+
+    name = None
+    # Whether photo URLs only work with a secret added by the server, so browsers must never be given them
+    server_side_photos = False
+
+    def available(self):
+        """Whether the provider is configured well enough to search."""
+        return True
+
+    @abstractmethod
+    def geocode(self, query, deadline=None):
+        """A GeocodedLocation for a free-text location, or None."""
+
+    @abstractmethod
+    def iter_pages(self, latitude, longitude, radius, category_id=None, max_results=10, deadline=None):
+        """Yield pages (lists) of places around a point, no more than max_results in total."""
+
+    def search(self, latitude, longitude, radius, category_id=None, max_results=10, deadline=None):
+        """Places around a point, all pages at once."""
+        return [place for page in self.iter_pages(latitude, longitude, radius, category_id, max_results, deadline) for place in page]
+
+    def photo_urls(self, place, deadline=None):
+        """Photo URLs for one of this provider's places."""
+        return []
+
+    def thumbnail(self, photo_url, deadline=None):
+        """Thumbnail bytes for one of this provider's photo URLs, downloaded by the server, or None."""
+        return photo_cache.get_thumbnail(photo_url, deadline)
+
+    def reviews(self, place, deadline=None):
+        """Reviews ({"user", "text"}) for one of this provider's places."""
+        return []
+
+class GoogleProvider(PlaceProvider):
+    """Google Places Nearby Search, with Google's geocoder.
+
+    Only the nearby search is called; photos come from the photo reference in its results, and
+    there are no reviews, so Google places need no further calls once found. Photo URLs carry no
+    API key: the key is added when the server downloads the photo, within the "google" budget.
+    """
+
+    name = "google"
+    server_side_photos = True
+
+    def __init__(self, api_key=None):
+        self.api_key = api_key or os.getenv("GOOGLE_MAPS_API_KEY")
+
+    def available(self):
+        return bool(self.api_key)
+
+    def fetch(self, url, params, deadline=None):
+        """GET a Google Maps API URL within the shared "google" request budget, cached like Foursquare responses."""
+        endpoint = "geocode" if url == GOOGLE_MAPS_API_PLACES else "nearbysearch"
+        cache_key = response_cache.cache_key(url, {key: value for key, value in params.items() if key != "key"})
+        cached = response_cache.get(cache_key)
+        telemetry.record_cache(f"google_{endpoint}", cached is not None)
+        if cached is not None:
+            return cached["data"]
+
+        started = time.perf_counter()
+        try:
+            response = api_client.get(url, params=dict(params, key=self.api_key), provider="google", priority=PRIORITY_SEARCH, deadline=deadline)
+        except requests.RequestException as e:
+            telemetry.record_request("google", endpoint, failure_status(e), time.perf_counter() - started)
+            raise
+        telemetry.record_request("google", endpoint, response.status_code, time.perf_counter() - started, len(response.content))
+        response.raise_for_status()
+        data = response.json()
+        if data.get("status") not in ("OK", "ZERO_RESULTS"):
+            raise ProviderError(f"Google returned {data.get('status')}: {data.get('error_message', '')}")
+        response_cache.put(cache_key, "geocode" if url == GOOGLE_MAPS_API_PLACES else "search", {"data": data, "next": None})
+        return data
+
+    def geocode(self, query, deadline=None):
+        try:
+            data = self.fetch(GOOGLE_MAPS_API_PLACES, {"address": query}, deadline)
+        except (requests.RequestException, ProviderError):
+            return None
+        if not data.get("results"):
+            return None
+        result = data["results"][0]
+        location = result["geometry"]["location"]
+        return GeocodedLocation(location["lat"], location["lng"], result.get("formatted_address", query))
+
+    def iter_pages(self, latitude, longitude, radius, category_id=None, max_results=10, deadline=None, place_type=None, keywords=SENSORY_KEYWORDS):
+        """Like PlaceProvider.iter_pages; place_type (a Google place type) overrides the one mapped from
+        category_id, and keywords replaces the sensory keywords searched for."""
+        params = {
+            "location": f"{latitude},{longitude}",
+            "radius": radius,
+            "keyword": " OR ".join(keywords),
+        }
+        category = next((name for name, fsq_id in FOURSQUARE_CATEGORIES.items() if fsq_id == category_id), None)
+        if place_type:
+            params["type"] = place_type
+        elif category in GOOGLE_CATEGORY_TYPES:
+            params["type"] = GOOGLE_CATEGORY_TYPES[category]
+
+        # One page of up to 20; Google's next_page_token only works after a delay, too slow for a Find
+        results = self.fetch(GOOGLE_MAPS_API_NEARBY, params, deadline).get("results", [])
+        yield [self.normalize(result) for result in results[:max_results]]
+
+    def normalize(self, result):
+        """A Nearby Search result as a Foursquare-shaped place."""
+        location = result["geometry"]["location"]
+        place = {
+            "fsq_id": f"google:{result['place_id']}",
+            "place_id": result["place_id"],
+            "provider": self.name,
+            "name": result.get("name", "Unknown Place"),
+            "geocodes": {"main": {"latitude": location["lat"], "longitude": location["lng"]}},
+            "location": {"address": result.get("vicinity", "")},
+            "categories": [{"name": place_type} for place_type in result.get("types", [])],
+        }
+        if "rating" in result:
+            place["rating"] = result["rating"] * 2  # Google rates out of 5, Foursquare out of 10
+            place["stats"] = {"total_ratings": result.get("user_ratings_total", 0)}
+        if result.get("photos"):
+            place["photo_reference"] = result["photos"][0]["photo_reference"]
+        return place
+
+    def photo_urls(self, place, deadline=None):
+        if not place.get("photo_reference"):
+            return []
+        return [photo_url(place["photo_reference"])]
+
+    def thumbnail(self, photo_url, deadline=None):
+        return photo_cache.get_thumbnail(photo_url, deadline, provider="google", params={"key": self.api_key})
+
+def photo_url(photo_reference):
+    """The keyless URL of a Google Places photo."""
+    return f"{GOOGLE_MAPS_API_URL_PHOTOS}?maxwidth=400&photoreference={photo_reference}"
+
+def failure_status(error):
+    """The telemetry status of a request that raised instead of returning a response."""
+    if isinstance(error, DeadlineExceeded):
+        return "deadline"
+    if isinstance(error, api_client.RequestDropped):
+        return "dropped"
+    if isinstance(error, CassetteMiss):
+        return "replay_miss"
+    return "error"
+
+def normalize_name(name):
+    """Lowercase a place name, drop accents and keep only letters and digits, so "Joe's Café" and "Joes Cafe" compare equal."""
+    decomposed = unicodedata.normalize("NFKD", name.lower())
+    return re.sub(r"[\W_]+", "", "".join(char for char in decomposed if not unicodedata.combining(char)))
+
+def is_duplicate(place, others, distance_m=DEDUPE_DISTANCE_M):
+    """Whether another provider's place has the same name within distance_m of this one."""
+    main = place.get("geocodes", {}).get("main", {})
+    name = normalize_name(place.get("name", ""))
+    for other in others:
+        other_main = other.get("geocodes", {}).get("main", {})
+        if name != normalize_name(other.get("name", "")) or not main or not other_main:
+            continue
+        if geo.haversine_m(main["latitude"], main["longitude"], other_main["latitude"], other_main["longitude"]) <= distance_m:
+            return True
+    return False
+
+class FederatedSearch:
+    """Searches several providers in parallel under one deadline, merging their results.
+
+    Each provider pages through its results on its own thread. pages() yields the new,
+    de-duplicated places as pages arrive from any provider, and stops when every provider is
+    done or the timeout passes (or the Find's deadline, if sooner), whichever comes first;
+    providers still searching are then told to stop after their current page and are listed in
+    `incomplete`, with failed ones in `failed`.
+    """
+
+    def __init__(self, providers, timeout=FEDERATED_SEARCH_TIMEOUT, initializer=None):
+        self.providers = providers
+        self.timeout = timeout
+        self.initializer = initializer  # run first on each provider's thread, e.g. to attach the script context
+        self.incomplete = []
+        self.failed = []
+
+    def pages(self, latitude, longitude, radius, category_id=None, max_results=10, deadline=None):
+        events = queue.Queue()
+        cancelled = threading.Event()
+
+        def run(provider):
+            if self.initializer:
+                self.initializer()
+            try:
+                for page in provider.iter_pages(latitude, longitude, radius, category_id, max_results, deadline):
+                    events.put((provider.name, page))
+                    if cancelled.is_set():
+                        break
+            except DeadlineExceeded:
+                return  # still counted as searching, so it is listed as incomplete when the deadline passes
+            except Exception as e:
+                events.put((provider.name, e))
+            events.put((provider.name, None))
+
+        for provider in self.providers:
+            threading.Thread(target=run, args=(provider,), name=f"search-{provider.name}", daemon=True).start()
+
+        timeout = self.timeout if deadline is None else min(self.timeout, deadline.remaining())
+        stop_at = time.monotonic() + timeout
+        searching = {provider.name for provider in self.providers}
+        found = {provider.name: [] for provider in self.providers}
+        remaining = max_results
+        while searching and remaining > 0:
+            try:
+                name, page = events.get(timeout=max(stop_at - time.monotonic(), 0))
+            except queue.Empty:
+                break
+            if page is None:
+                searching.discard(name)
+                continue
+            if isinstance(page, Exception):
+                self.failed.append(name)
+                continue
+
+            # A place another provider has already returned is dropped
+            others = [place for other, places in found.items() if other != name for place in places]
+            new_places = [place for place in page if not is_duplicate(place, others)][:remaining]
+            found[name] += new_places
+            remaining -= len(new_places)
+            if new_places:
+                yield new_places
+
+        cancelled.set()
+        self.incomplete = sorted(searching - set(self.failed)) if remaining > 0 else []
@@ -0,0 +1,136 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+from config import (
+    RESPONSE_CACHE_PATH,
+    RESPONSE_CACHE_TTLS,
+    RESPONSE_CACHE_MAX_BYTES,
+)
+
+# Eviction needs a full scan of the sizes, so it only runs every few writes
+EVICTION_CHECK_INTERVAL = 25
+
+_local = threading.local()
+# Counted across threads: each script run and enrichment pool has short-lived threads of its own
+_writes = 0
+_writes_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+_stats_lock = threading.Lock()
+
+def _count(key, amount=1):
+    with _stats_lock:
+        _stats[key] += amount
+
+def _connect():
+    """Return this thread's connection to the cache database, creating the schema on first use."""
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        os.makedirs(os.path.dirname(RESPONSE_CACHE_PATH) or ".", exist_ok=True)
+        # WAL lets several Streamlit worker processes read while one of them writes
+        conn = sqlite3.connect(RESPONSE_CACHE_PATH, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                endpoint TEXT NOT NULL,
+                value BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                expires_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)")
+        _local.conn = conn
+    return conn
+
+def cache_key(url, params=None):
+    """Normalize a URL and its params so equivalent requests share one cache entry."""
+    parts = urlsplit(url)
+    query = parse_qsl(parts.query, keep_blank_values=True)
+    if params:
+        query += [(str(k), str(v)) for k, v in params.items()]
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path.rstrip("/"), urlencode(sorted(query)), ""))
+
+def endpoint_for(url):
+    """Classify a Foursquare Places URL as search, photos, tips or details."""
+    path = urlsplit(url).path.rstrip("/")
+    last_segment = path.rsplit("/", 1)[-1]
+    if last_segment in ("search", "photos", "tips"):
+        return last_segment
+    return "details"
+
+def get(key, record_stats=True):
+    """Return the cached value for a key, or None when it is missing or expired."""
+    conn = _connect()
+    now = time.time()
+    row = conn.execute("SELECT value, expires_at FROM responses WHERE key = ?", (key,)).fetchone()
+    if row is None or row[1] <= now:
+        if record_stats:
+            _count("misses")
+        return None
+
+    conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+    if record_stats:
+        _count("hits")
+    return json.loads(zlib.decompress(row[0]))
+
+def peek(key):
+    """Like get, but for opportunistic lookups that should not count towards the hit rate."""
+    return get(key, record_stats=False)
+
+def put(key, endpoint, value, ttl=None):
+    """Store a JSON-serializable value for the endpoint's TTL."""
+    if ttl is None:
+        ttl = RESPONSE_CACHE_TTLS.get(endpoint, RESPONSE_CACHE_TTLS["details"])
+    blob = zlib.compress(json.dumps(value, separators=(",", ":")).encode("utf-8"))
+    now = time.time()
+
+    conn = _connect()
+    conn.execute(
+        "INSERT OR REPLACE INTO responses (key, endpoint, value, size, expires_at, last_access) VALUES (?, ?, ?, ?, ?, ?)",
+        (key, endpoint, blob, len(blob), now + ttl, now),
+    )
+    _count("writes")
+
+    global _writes
+    with _writes_lock:
+        _writes += 1
+        check = _writes % EVICTION_CHECK_INTERVAL == 0
+    if check:
+        evict()
+
+def evict(max_bytes=RESPONSE_CACHE_MAX_BYTES):
+    """Drop expired entries, then the least recently used ones until the cache fits in max_bytes."""
+    conn = _connect()
+    removed = conn.execute("DELETE FROM responses WHERE expires_at <= ?", (time.time(),)).rowcount
+
+    total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+    if total > max_bytes:
+        stale_keys = []
+        for key, size in conn.execute("SELECT key, size FROM responses ORDER BY last_access"):
+            if total <= max_bytes:
+                break
+            stale_keys.append((key,))
+            total -= size
+        conn.executemany("DELETE FROM responses WHERE key = ?", stale_keys)
+        removed += len(stale_keys)
+
+    _count("evictions", removed)
+    return removed
+
+def stats():
+    """Hit, miss, write and eviction counters for this process, plus the cache's size on disk."""
+    conn = _connect()
+    entries, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+    with _stats_lock:
+        report = dict(_stats)
+    lookups = report["hits"] + report["misses"]
+    report["hit_rate"] = report["hits"] / lookups if lookups else 0.0
+    report["entries"] = entries
+    report["bytes"] = size
+    return report
@@ -0,0 +1,92 @@
+import heapq
+import itertools
+import threading
+import time
+from config import (
+    SCHEDULER_BUCKETS,
+    SCHEDULER_MAX_WAIT,
+)
+
+# Priority classes, most important first
+PRIORITY_SEARCH = 0  # searches and geocoding, which users are waiting on
+PRIORITY_DETAILS = 1  # details and tips
+PRIORITY_PHOTOS = 2  # nice to have: dropped rather than queued when the bucket is empty
+
+class TokenBucket:
+    """Allows rate requests per second on average, with bursts of up to capacity."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def seconds_until_token(self):
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+class Scheduler:
+    """Shares per-provider request budgets between every session in the process.
+
+    Callers queue by priority; within a priority they are served first come, first served.
+    Photo-priority requests never queue: they are dropped when no token is free right away.
+    """
+
+    def __init__(self, buckets):
+        self.buckets = {provider: TokenBucket(rate, capacity) for provider, (rate, capacity) in buckets.items()}
+        self.waiting = {provider: [] for provider in buckets}
+        self.condition = threading.Condition()
+        self.sequence = itertools.count()
+        self.stats = {provider: {"granted": 0, "dropped": 0, "timed_out": 0, "waited_seconds": 0.0} for provider in buckets}
+
+    def acquire(self, provider, priority=PRIORITY_DETAILS, timeout=SCHEDULER_MAX_WAIT):
+        """Take a token for one request to provider; False when the request should not be sent."""
+        if provider not in self.buckets:
+            return True
+        bucket, queue, stats = self.buckets[provider], self.waiting[provider], self.stats[provider]
+        started = time.monotonic()
+
+        with self.condition:
+            bucket.refill()
+            if priority >= PRIORITY_PHOTOS and (queue or bucket.tokens < 1):
+                stats["dropped"] += 1
+                return False
+
+            ticket = (priority, next(self.sequence))
+            heapq.heappush(queue, ticket)
+            try:
+                while True:
+                    bucket.refill()
+                    if queue[0] == ticket and bucket.tokens >= 1:
+                        bucket.tokens -= 1
+                        stats["granted"] += 1
+                        stats["waited_seconds"] += time.monotonic() - started
+                        return True
+
+                    remaining = timeout - (time.monotonic() - started)
+                    if remaining <= 0:
+                        stats["timed_out"] += 1
+                        return False
+                    wait = bucket.seconds_until_token() if queue[0] == ticket else remaining
+                    self.condition.wait(min(max(wait, 0.001), remaining))
+            finally:
+                queue.remove(ticket)
+                heapq.heapify(queue)
+                # The next caller in line may be able to go now
+                self.condition.notify_all()
+
+    def report(self):
+        """Granted, dropped and timed-out counts and tokens left for each provider."""
+        with self.condition:
+            report = {}
+            for provider, bucket in self.buckets.items():
+                bucket.refill()
+                report[provider] = dict(self.stats[provider], tokens=round(bucket.tokens, 2), queued=len(self.waiting[provider]))
+            return report
+
+# The process-wide scheduler shared by every outbound API call
+scheduler = Scheduler(SCHEDULER_BUCKETS)
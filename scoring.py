@@ -0,0 +1,51 @@
+import numpy as np
+from scipy.sparse import csr_matrix
+from config import SENSORY_KEYWORDS, ACCESSIBLE_KEYWORDS, SCORING_WEIGHTS
+from keywords import KeywordMatcher
+
+# Columns of the term matrix: every sensory keyword, then every accessibility keyword
+VOCABULARY = list(dict.fromkeys(SENSORY_KEYWORDS + ACCESSIBLE_KEYWORDS))
+TERM_INDEX = {term: i for i, term in enumerate(VOCABULARY)}
+vocabulary_matcher = KeywordMatcher(VOCABULARY)
+
+def term_weights():
+    """Weight of each vocabulary term, sensory keywords first."""
+    return np.array([
+        SCORING_WEIGHTS["sensory"] if term in SENSORY_KEYWORDS else SCORING_WEIGHTS["accessible"]
+        for term in VOCABULARY
+    ])
+
+def _tip_text(tip):
+    return tip.get("text", "") if isinstance(tip, dict) else tip
+
+def term_matrix(tips_by_place):
+    """Sparse places x terms matrix counting how often each term appears in each place's tips.
+
+    tips_by_place is a list with one entry per place: a list of tips, each either a review
+    dict with a "text" key (as returned by get_place_reviews) or a plain string.
+    """
+    rows, cols = [], []
+    for row, tips in enumerate(tips_by_place):
+        # One scan per place: its tips are joined so the regex engine runs once, not once per tip
+        text = "\n".join(_tip_text(tip) for tip in tips)
+        for term, _, _ in vocabulary_matcher.find_all(text):
+            rows.append(row)
+            cols.append(TERM_INDEX[term])
+
+    data = np.ones(len(rows), dtype=np.float32)
+    # Duplicate (row, col) pairs are summed, giving the counts
+    return csr_matrix((data, (rows, cols)), shape=(len(tips_by_place), len(VOCABULARY)), dtype=np.float32)
+
+def score_places(tips_by_place, weights=None):
+    """Score every place's tips in one vectorized pass; higher means more sensory-friendly.
+
+    Repeated mentions of a term are dampened with log1p, and the weighted sum is divided by
+    the square root of the place's tip count so places with many tips don't win on volume alone.
+    """
+    if not tips_by_place:
+        return np.zeros(0)
+    weights = term_weights() if weights is None else np.asarray(weights, dtype=np.float32)
+
+    counts = term_matrix(tips_by_place)
+    tip_counts = np.fromiter((len(tips) for tips in tips_by_place), dtype=np.float32, count=len(tips_by_place))
+    return (counts.log1p() @ weights) / np.sqrt(np.maximum(tip_counts, 1))
@@ -0,0 +1,67 @@
+import threading
+import time
+
+class WaitTimedOut(TimeoutError):
+    """A waiting caller's timeout passed before the leader finished."""
+
+class SingleFlight:
+    """Runs a call once for all callers that ask for the same key while it is in flight.
+
+    The first caller (the leader) runs it; everyone arriving before it finishes waits and gets
+    the leader's result, or its exception.
+    """
+
+    def __init__(self):
+        self.in_flight = {}
+        self.lock = threading.Lock()
+        self.stats = {"calls": 0, "executed": 0, "shared": 0}
+
+    def do(self, key, fn, timeout=None, retry_on=()):
+        """Run fn for key, or wait for the call already in flight for it.
+
+        A waiting caller gives up after timeout seconds with WaitTimedOut. One whose leader failed
+        with one of the retry_on exceptions (e.g. the leader's own deadline passing) doesn't take
+        that error as its own: it runs the call again, or joins whoever got there first.
+        """
+        started = time.monotonic()
+        while True:
+            with self.lock:
+                self.stats["calls"] += 1
+                call = self.in_flight.get(key)
+                leader = call is None
+                if leader:
+                    call = self.in_flight[key] = {"done": threading.Event()}
+                    self.stats["executed"] += 1
+                else:
+                    self.stats["shared"] += 1
+
+            if leader:
+                break
+            remaining = None if timeout is None else max(timeout - (time.monotonic() - started), 0)
+            if not call["done"].wait(remaining):
+                raise WaitTimedOut(f"Gave up waiting for the call in flight for {key}")
+            if "error" not in call:
+                return call["result"]
+            if not isinstance(call["error"], retry_on):
+                raise call["error"]
+
+        try:
+            call["result"] = fn()
+            return call["result"]
+        except BaseException as e:
+            call["error"] = e
+            raise
+        finally:
+            with self.lock:
+                del self.in_flight[key]
+            call["done"].set()
+
+    def report(self):
+        """Calls made, calls actually executed and calls saved by sharing an in-flight result."""
+        with self.lock:
+            return dict(self.stats, in_flight=len(self.in_flight))
+
+# One group per kind of outbound call, shared by every session in the process
+foursquare_flights = SingleFlight()
+geocoding_flights = SingleFlight()
+photo_flights = SingleFlight()
@@ -0,0 +1,143 @@
+import os
+import threading
+from collections import defaultdict
+from config import TELEMETRY_TEXTFILE_PATH
+
+# Upper bounds, in seconds, of the request latency histogram buckets
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, float("inf"))
+
+_lock = threading.Lock()
+_requests = defaultdict(int)  # (provider, endpoint, status) -> count
+_bytes = defaultdict(int)  # (provider, endpoint) -> response bytes
+_latency_counts = defaultdict(lambda: [0] * len(LATENCY_BUCKETS))  # (provider, endpoint) -> per-bucket counts
+_latency_sums = defaultdict(float)  # (provider, endpoint) -> total seconds
+_stage_counts = defaultdict(lambda: [0] * len(LATENCY_BUCKETS))  # Find stage -> per-bucket counts
+_stage_sums = defaultdict(float)  # Find stage -> total seconds
+_cache_lookups = defaultdict(int)  # (cache, "hit" | "miss") -> count
+_counters = defaultdict(float)  # name -> value, for anything else worth counting
+
+def record_request(provider, endpoint, status, seconds, size=0):
+    """Count one outbound request: its status ("200", "429", "error", ...), latency and response size."""
+    with _lock:
+        _requests[(provider, endpoint, str(status))] += 1
+        _bytes[(provider, endpoint)] += size
+        _latency_sums[(provider, endpoint)] += seconds
+        _observe(_latency_counts[(provider, endpoint)], seconds)
+
+def record_stage(stage, seconds):
+    """Time spent in one stage of a Find ("geocode", "search", "enrich")."""
+    with _lock:
+        _stage_sums[stage] += seconds
+        _observe(_stage_counts[stage], seconds)
+
+def _observe(counts, seconds):
+    for i, bound in enumerate(LATENCY_BUCKETS):
+        if seconds <= bound:
+            counts[i] += 1
+            break
+
+def record_cache(cache, hit):
+    """Count one cache lookup."""
+    with _lock:
+        _cache_lookups[(cache, "hit" if hit else "miss")] += 1
+
+def increment(name, amount=1):
+    """Add to a free-form counter."""
+    with _lock:
+        _counters[name] += amount
+
+def snapshot():
+    """A consistent copy of every metric."""
+    with _lock:
+        return {
+            "requests": dict(_requests),
+            "bytes": dict(_bytes),
+            "latency_counts": {key: list(counts) for key, counts in _latency_counts.items()},
+            "latency_sums": dict(_latency_sums),
+            "stage_counts": {stage: list(counts) for stage, counts in _stage_counts.items()},
+            "stage_sums": dict(_stage_sums),
+            "cache_lookups": dict(_cache_lookups),
+            "counters": dict(_counters),
+        }
+
+def latency_quantile(counts, quantile):
+    """Upper bound of the histogram bucket holding the given quantile, in seconds."""
+    total = sum(counts)
+    if not total:
+        return None
+    running = 0
+    for bound, count in zip(LATENCY_BUCKETS, counts):
+        running += count
+        if running >= quantile * total:
+            return bound
+    return LATENCY_BUCKETS[-1]
+
+def _number(value):
+    """A sample value at full precision: whole numbers (counters are kept as floats) without a fraction."""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+def _labels(**labels):
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels.items()) + "}"
+
+def render_prometheus(gauges=None):
+    """Every metric in the Prometheus text exposition format.
+
+    gauges maps metric names to values (or to {labels tuple: value}) for point-in-time readings
+    gathered by the caller, such as cache sizes or connection counts.
+    """
+    metrics = snapshot()
+    lines = ["# TYPE sensory_heaven_api_requests_total counter"]
+    for (provider, endpoint, status), count in sorted(metrics["requests"].items()):
+        lines.append(f"sensory_heaven_api_requests_total{_labels(provider=provider, endpoint=endpoint, status=status)} {count}")
+
+    lines.append("# TYPE sensory_heaven_api_response_bytes_total counter")
+    for (provider, endpoint), size in sorted(metrics["bytes"].items()):
+        lines.append(f"sensory_heaven_api_response_bytes_total{_labels(provider=provider, endpoint=endpoint)} {size}")
+
+    lines.append("# TYPE sensory_heaven_api_request_seconds histogram")
+    for (provider, endpoint), counts in sorted(metrics["latency_counts"].items()):
+        running = 0
+        for bound, count in zip(LATENCY_BUCKETS, counts):
+            running += count
+            le = "+Inf" if bound == float("inf") else bound
+            lines.append(f"sensory_heaven_api_request_seconds_bucket{_labels(provider=provider, endpoint=endpoint, le=le)} {running}")
+        lines.append(f"sensory_heaven_api_request_seconds_sum{_labels(provider=provider, endpoint=endpoint)} {metrics['latency_sums'][(provider, endpoint)]:.6f}")
+        lines.append(f"sensory_heaven_api_request_seconds_count{_labels(provider=provider, endpoint=endpoint)} {running}")
+
+    lines.append("# TYPE sensory_heaven_find_stage_seconds histogram")
+    for stage, counts in sorted(metrics["stage_counts"].items()):
+        running = 0
+        for bound, count in zip(LATENCY_BUCKETS, counts):
+            running += count
+            le = "+Inf" if bound == float("inf") else bound
+            lines.append(f"sensory_heaven_find_stage_seconds_bucket{_labels(stage=stage, le=le)} {running}")
+        lines.append(f"sensory_heaven_find_stage_seconds_sum{_labels(stage=stage)} {metrics['stage_sums'][stage]:.6f}")
+        lines.append(f"sensory_heaven_find_stage_seconds_count{_labels(stage=stage)} {running}")
+
+    lines.append("# TYPE sensory_heaven_cache_lookups_total counter")
+    for (cache, result), count in sorted(metrics["cache_lookups"].items()):
+        lines.append(f"sensory_heaven_cache_lookups_total{_labels(cache=cache, result=result)} {count}")
+
+    for name, value in sorted(metrics["counters"].items()):
+        lines.append(f"# TYPE sensory_heaven_{name} counter")
+        lines.append(f"sensory_heaven_{name} {_number(value)}")
+
+    for name, value in sorted((gauges or {}).items()):
+        lines.append(f"# TYPE sensory_heaven_{name} gauge")
+        if isinstance(value, dict):
+            for labels, labelled_value in sorted(value.items()):
+                lines.append(f"sensory_heaven_{name}{_labels(**dict(labels))} {_number(labelled_value)}")
+        else:
+            lines.append(f"sensory_heaven_{name} {_number(value)}")
+
+    return "\n".join(lines) + "\n"
+
+def write_textfile(text, path=TELEMETRY_TEXTFILE_PATH):
+    """Write metrics for a node_exporter textfile collector, replacing the file atomically."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(text)
+    os.replace(tmp_path, path)